@@ -1,4 +1,32 @@
-__all__ = ['readbin', 'bintools']
+__all__ = ['readbin', 'bintools', 'dirsigbin', 'geometry', 'spatialindex',
+    'mapreduce', 'noise', 'sparse', 'sharedmem', 'bincodec', 'transcode',
+    'ragged', 'reader', 'follow', 'cache', 'archive',
+    'bindiff', 'waveform', 'decompose', 'raster',
+    'export', 'columnar', 'fpa', 'mosaic',
+    'spill']
 
 from readbin import *
 from bintools import *
+from dirsigbin import *
+from geometry import *
+from spatialindex import *
+from mapreduce import *
+from noise import *
+from sparse import *
+from sharedmem import *
+from bincodec import *
+from transcode import *
+from ragged import *
+from reader import *
+from follow import *
+from cache import *
+from archive import *
+from bindiff import *
+from waveform import *
+from decompose import *
+from raster import *
+from export import *
+from columnar import *
+from fpa import *
+from mosaic import *
+from spill import *
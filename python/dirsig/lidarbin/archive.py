@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+
+"""This module reads bin files from compressed files and tar archives.
+
+Description:
+    Bin files are often archived as .bin.gz, .bin.bz2 or .bin.xz files, or in
+    tarballs of whole simulation directories. The functions here read them as
+    streams: the compressed data is decompressed a block at a time as the bin
+    file is read, the stream is never seeked backwards, and nothing is
+    extracted to a temporary file. The members of a tar archive (which may
+    itself be compressed) are read in the order they are stored.
+
+    DirsigBin.read and readbin accept the streams in place of a filename.
+    DirsigBinStream decodes the pulses of a stream one at a time, so a pulse
+    can be analyzed and dropped before the next one is decoded.
+
+Usage:
+    To read a compressed bin file:
+        binfile = DirsigBin().read(open_stream('run.bin.gz'))
+    To get the peak of every pulse of every bin file in a tarball:
+        for name, stream in iter_tar('runs.tar.xz'):
+            for task, pulse, data in stream:
+                print name, task, pulse, data.statistics()['active_max']
+
+External Dependancies:
+    bz2
+    lzma (Python 3) or backports.lzma (Python 2), optional
+    tarfile
+    zlib
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import bz2
+import fnmatch
+import os
+import tarfile
+import zlib
+
+from bincodec import lzma
+from dirsigbin import DirsigBinHeader, DirsigBinTaskHeader, DirsigBinPulse
+
+# the number of compressed bytes that are read at a time
+READ_BYTES = 1 << 20
+
+# bz2 and xz decompressors can not limit their output, so they are given
+# small pieces of compressed data at a time (each can still complete a whole
+# compressed block, which is at most a few tens of MB of zeros for bz2)
+SMALL_READ_BYTES = 1 << 12
+
+
+def _decompressor(codec):
+    """ Make a decompressor object for 'gz', 'bz2' or 'xz' """
+    if codec == 'gz':
+        # a gzip header and trailer
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif codec == 'bz2':
+        return bz2.BZ2Decompressor()
+    elif codec == 'xz':
+        if lzma is None:
+            raise RuntimeError('xz compressed files need the lzma (or ' \
+                'backports.lzma) module.')
+        return lzma.LZMADecompressor()
+    raise ValueError("Unknown codec '{0}'".format(codec))
+
+
+def stream_codec(name):
+    """ Get the codec of a file from its extension, or None if uncompressed """
+    extension = os.path.splitext(name)[1].lower()
+    # the short extensions of compressed tarballs
+    extension = {'.tgz': '.gz', '.tbz': '.bz2', '.tbz2': '.bz2', \
+        '.txz': '.xz'}.get(extension, extension)
+    if extension in ('.gz', '.gzip'):
+        return 'gz'
+    elif extension in ('.bz2', '.bzip2'):
+        return 'bz2'
+    elif extension in ('.xz', '.lzma'):
+        return 'xz'
+    return None
+
+
+class DecompressingStream(object):
+    """ A read-only, forward-only file-like object over compressed data """
+    def __init__(self, source, codec, name=None):
+        self.source = source
+        self.codec = codec
+        self.name = name if name is not None else getattr(source, 'name', \
+            '<stream>')
+        self._decompressor = _decompressor(codec)
+        # compressed data that has not been given to the decompressor yet
+        self._pending = ''
+        self._buffer = ''
+        # the offset of the first unread byte of the buffer
+        self._offset = 0
+        self._position = 0
+        self._eof = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _fill(self, size):
+        """ Decompress until size bytes are buffered or the data runs out
+
+        gzip output is limited to the bytes that are still wanted, so mostly
+        zero data that expands a lot is not decompressed all at once.
+        """
+        buffered = len(self._buffer) - self._offset
+        if buffered >= size:
+            return
+        chunks = [self._buffer[self._offset:]]
+        self._offset = 0
+        while buffered < size and not self._eof:
+            if not self._pending:
+                self._pending = self.source.read(READ_BYTES if \
+                    self.codec == 'gz' else SMALL_READ_BYTES)
+                if not self._pending:
+                    self._eof = True
+                    break
+            if self.codec == 'gz':
+                # 0 is no limit (read everything)
+                limit = 0 if size == float('inf') else int(size - buffered)
+                chunk = self._decompressor.decompress(self._pending, limit)
+                self._pending = self._decompressor.unconsumed_tail
+            else:
+                chunk = self._decompressor.decompress(self._pending)
+                self._pending = ''
+            chunks.append(chunk)
+            buffered += len(chunk)
+            # concatenated gzip (or bz2) members start a new decompressor
+            unused = getattr(self._decompressor, 'unused_data', '')
+            if unused:
+                # it is everything after the end of the member (zlib also
+                # leaves it in unconsumed_tail)
+                self._pending = unused
+                self._decompressor = _decompressor(self.codec)
+        self._buffer = ''.join(chunks)
+
+    def read(self, size=-1):
+        """ Read up to size bytes (all of the rest if size < 0) """
+        if size is None or size < 0:
+            self._fill(float('inf'))
+            size = len(self._buffer) - self._offset
+        else:
+            self._fill(size)
+        output = self._buffer[self._offset:self._offset + size]
+        self._offset += len(output)
+        self._position += len(output)
+        return output
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        """ Skip forward (seeking backwards is not possible) """
+        if whence == 1:
+            offset += self._position
+        elif whence != 0:
+            raise IOError('A decompressing stream can not seek from the end.')
+        if offset < self._position:
+            raise IOError('A decompressing stream can not seek backwards.')
+        while self._position < offset:
+            if not self.read(min(offset - self._position, READ_BYTES)):
+                break
+
+    def close(self):
+        self._buffer = ''
+        self._pending = ''
+        self._offset = 0
+        if hasattr(self.source, 'close'):
+            self.source.close()
+
+
+def open_stream(filename):
+    """Opens a bin file, decompressing it on the fly if it is compressed.
+
+    Args:
+        filename (str): The file. Files ending in .gz, .bz2, .xz or .lzma are
+            decompressed.
+
+    Returns:
+        A file-like object that can be passed to DirsigBin.read, readbin or
+        DirsigBinStream.
+
+    """
+    codec = stream_codec(filename)
+    if codec is None:
+        return open(filename, 'rb')
+    return DecompressingStream(open(filename, 'rb'), codec, name=filename)
+
+
+class DirsigBinStream(object):
+    """ Decodes the pulses of a bin file stream one at a time
+
+    The file header is read when the stream is created. The task headers are
+    added to task_headers as the iteration reaches them.
+    """
+    def __init__(self, fid, is32bit=False):
+        self.fid = fid
+        self.is32bit = is32bit
+        self.name = str(getattr(fid, 'name', '<stream>'))
+        if fid.read(11) != "DIRSIGPROTO":
+            raise RuntimeError("'" + self.name + \
+                "' is not valid DIRSIG bin file.")
+        self.header = DirsigBinHeader().read(fid)
+        self.task_headers = []
+
+    def __iter__(self):
+        """ Yield (task, pulse, DirsigBinPulse) tuples in file order """
+        version = self.header.file_format_version
+        endian = self.header.endian()
+        for task in range(self.header.task_count):
+            task_header = DirsigBinTaskHeader().read(self.fid, version, endian)
+            self.task_headers.append(task_header)
+            for pulse in range(task_header.pulse_count):
+                yield task, pulse, DirsigBinPulse().read(self.fid, version, \
+                    endian, self.header.x_pixel_count, \
+                    self.header.y_pixel_count, is32bit=self.is32bit)
+
+
+def iter_tar(filename, pattern='*.bin*', is32bit=False):
+    """Streams the bin files in a (possibly compressed) tar archive.
+
+    The archive is read once, in order. Each stream has to be used before the
+    next one is yielded; it can not be used afterwards. A compressed archive
+    given by name (.tar.gz, .tgz, .tar.bz2, .tar.xz, .txz, ...) is
+    decompressed with DecompressingStream, since tarfile can not read xz
+    archives on Python 2. A file-like archive is read with tarfile's own
+    codecs (gzip and bz2); wrap an xz one in a DecompressingStream first.
+
+    Args:
+        filename (str or file-like): The tar archive.
+        pattern (str, optional): The pattern of the names of the members to
+            read. Members that end in .gz, .bz2, .xz or .lzma are decompressed.
+            The default is '*.bin*'.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Yields:
+        (member name, DirsigBinStream) tuples.
+
+    """
+    source = None
+    if hasattr(filename, 'read'):
+        archive = tarfile.open(fileobj=filename, mode='r|*')
+    elif stream_codec(filename) is not None:
+        source = DecompressingStream(open(filename, 'rb'), \
+            stream_codec(filename), name=filename)
+        try:
+            archive = tarfile.open(fileobj=source, mode='r|')
+        except Exception:
+            source.close()
+            raise
+    else:
+        archive = tarfile.open(filename, mode='r|*')
+    try:
+        for member in archive:
+            if not member.isfile() or not fnmatch.fnmatch( \
+                os.path.basename(member.name), pattern):
+                continue
+            fid = archive.extractfile(member)
+            codec = stream_codec(member.name)
+            if codec is not None:
+                fid = DecompressingStream(fid, codec, name=member.name)
+            yield member.name, DirsigBinStream(fid, is32bit=is32bit)
+    finally:
+        archive.close()
+        if source is not None:
+            source.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""This module encodes and decodes the pulse data of bin files.
+
+Description:
+    DIRSIG writes the pulse data either uncompressed (data compression type
+    0) or compressed with zlib (type 1). Bin files that have been transcoded
+    (see transcode.py) can also use other codecs and pre-filters. The codec is
+    stored in the low 4 bits of the data compression type, and the filters in
+    the high bits:
+        0       none
+        1       zlib
+        2       bz2
+        3       lzma (xz)
+        0x10    byte shuffle: the n-th bytes of every double are stored
+                together
+        0x20    delta: each double is stored as the difference of its bits
+                from the previous double
+    The filters are lossless. They are applied delta first, then shuffle,
+    before compressing. Only types 0 and 1 can be read by DIRSIG itself.
+
+External Dependancies:
+    bz2
+    lzma (Python 3) or backports.lzma (Python 2), optional
+    numpy
+    zlib
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import bz2
+import numpy
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_BZ2 = 2
+COMPRESSION_LZMA = 3
+CODEC_MASK = 0x0F
+FILTER_SHUFFLE = 0x10
+FILTER_DELTA = 0x20
+
+CODECS = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, \
+    'bz2': COMPRESSION_BZ2, 'lzma': COMPRESSION_LZMA}
+FILTERS = {'shuffle': FILTER_SHUFFLE, 'delta': FILTER_DELTA}
+
+
+def compression_type(codec='zlib', filters=()):
+    """Gets the data compression type of a codec and filters.
+
+    Args:
+        codec (str, optional): 'none', 'zlib', 'bz2' or 'lzma'. The default is
+            'zlib'.
+        filters (iterable, optional): Any of 'shuffle' and 'delta'. The
+            default is no filters.
+
+    Returns:
+        An int containing the data compression type.
+
+    """
+    try:
+        output = CODECS[codec]
+        for name in filters:
+            output |= FILTERS[name]
+    except KeyError, error:
+        raise ValueError('Unknown codec or filter: {0}'.format(error))
+    return output
+
+
+def _compressor(compression):
+    """ Get the (compress, decompress) functions of a compression type """
+    codec = compression & CODEC_MASK
+    if codec == COMPRESSION_NONE:
+        return (lambda data, level: data), (lambda data: data)
+    elif codec == COMPRESSION_ZLIB:
+        return zlib.compress, zlib.decompress
+    elif codec == COMPRESSION_BZ2:
+        return bz2.compress, bz2.decompress
+    elif codec == COMPRESSION_LZMA:
+        if lzma is None:
+            raise RuntimeError('lzma compressed pulse data needs the lzma ' \
+                '(or backports.lzma) module.')
+        return (lambda data, level: lzma.compress(data, preset=level)), \
+            lzma.decompress
+    raise RuntimeError('Unknown data compression type {0}'.format(compression))
+
+
+def encode_payload(data, compression, level=6):
+    """Encodes the pulse data of a pulse.
+
+    Args:
+        data (str): The uncompressed pulse data (doubles).
+        compression (int): The data compression type (see compression_type).
+        level (int, optional): The compression level. The default is 6.
+
+    Returns:
+        A str containing the encoded pulse data.
+
+    """
+    compress = _compressor(compression)[0]
+    if compression & (FILTER_DELTA | FILTER_SHUFFLE):
+        values = numpy.frombuffer(data, dtype=numpy.uint64)
+        if compression & FILTER_DELTA:
+            values = values.copy()
+            values[1:] -= values[:-1].copy()
+        if compression & FILTER_SHUFFLE:
+            values = values.view(numpy.uint8).reshape((-1, 8)).T
+        data = numpy.ascontiguousarray(values).tostring()
+    if compression & CODEC_MASK == COMPRESSION_NONE:
+        return data
+    return compress(data, level)
+
+
+def decode_payload(data, compression):
+    """Decodes the pulse data of a pulse.
+
+    Args:
+        data (str): The pulse data as stored in the bin file.
+        compression (int): The data compression type of the pulse.
+
+    Returns:
+        A str containing the uncompressed pulse data (doubles).
+
+    """
+    data = _compressor(compression)[1](data)
+    if compression & (FILTER_DELTA | FILTER_SHUFFLE):
+        values = numpy.frombuffer(data, dtype=numpy.uint8)
+        if compression & FILTER_SHUFFLE:
+            values = values.reshape((8, -1)).T
+        values = numpy.ascontiguousarray(values).view(numpy.uint64).ravel()
+        if compression & FILTER_DELTA:
+            # unsigned integer sums wrap around, which undoes the difference
+            values = numpy.cumsum(values, dtype=numpy.uint64)
+        data = values.tostring()
+    return data
+
+
+def payload_values(data, endian='<'):
+    """Converts uncompressed pulse data into an array of native doubles.
+
+    The bytes are copied once into a writable array, which is byteswapped in
+    place if the byte order of the file is not the native byte order.
+
+    Args:
+        data (str): The uncompressed pulse data (see decode_payload).
+        endian (str, optional): The byte order of the bin file, '<' or '>'.
+            The default is '<'.
+
+    Returns:
+        A 1D numpy.array of native doubles.
+
+    """
+    values = numpy.frombuffer(bytearray(data), dtype=endian + 'f8')
+    if not values.dtype.isnative:
+        values = values.byteswap(True).view(values.dtype.newbyteorder())
+    return values
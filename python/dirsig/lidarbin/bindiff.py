@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+"""This module compares two bin files pulse by pulse.
+
+Description:
+    The two files are read in lockstep, one window of pulses at a time, so
+    neither file is ever held in memory. The file, task and pulse headers are
+    compared field by field. The pulse data of each pair of pulses is decoded
+    and compared by a pool of worker processes, which compute:
+        - max_abs_diff: the largest absolute difference of the active term
+        - relative_error: the L2 norm of the difference of the active terms,
+          relative to the L2 norm of the active term of the first file
+        - energy_difference: the sum of the active term of the second file
+          minus that of the first
+        - passive_max_abs_diff: the largest absolute difference of the passive
+          term
+    Pulses whose shapes differ get NaN metrics and a shape_mismatch flag.
+
+USAGE:
+    python bindiff.py [options] file_a file_b
+
+    [options] are:
+    --processes=<number>        The number of processes to run simultaneously.
+                                  The default is 2.
+    --tolerance=<value>         The relative error above which a pulse is
+                                  reported. The default is 1e-9.
+    --32bit                     The files were written by a 32 bit build of
+                                  DIRSIG (version 0 or 1 bin files).
+
+External Dependancies:
+    multiprocessing
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import multiprocessing
+import numpy
+
+from archive import open_stream
+from bincodec import decode_payload
+from dirsigbin import DirsigBinHeader, DirsigBinTaskHeader, \
+    DirsigBinPulseHeader
+
+# the per pulse metrics of diff_bins
+PULSE_DIFF_DTYPE = numpy.dtype([
+    ('task', 'u4'),
+    ('pulse', 'u4'),
+    ('max_abs_diff', 'f8'),
+    ('relative_error', 'f8'),
+    ('energy_difference', 'f8'),
+    ('passive_max_abs_diff', 'f8'),
+    ('header_differences', 'u4'),
+    ('shape_mismatch', '?')])
+
+# header fields that are expected to differ between runs
+IGNORED_FIELDS = ('file_creation_date_time', 'dirsig_version_string', \
+    'task_start_date_time', 'task_stop_date_time', 'data_compression_type', \
+    'pulse_data_bytes')
+
+
+def diff_headers(header_a, header_b, ignore=IGNORED_FIELDS):
+    """Compares two headers field by field.
+
+    Args:
+        header_a: A DirsigBinHeader, DirsigBinTaskHeader or
+            DirsigBinPulseHeader.
+        header_b: A header of the same type.
+        ignore (iterable, optional): The fields not to compare. The default is
+            IGNORED_FIELDS.
+
+    Returns:
+        A list of (field, value a, value b) tuples of the fields that differ.
+        A field that is only in one header has a value of None in the other.
+
+    """
+    fields_a = vars(header_a)
+    fields_b = vars(header_b)
+    output = []
+    for name in sorted(set(fields_a) | set(fields_b)):
+        if name in ignore:
+            continue
+        value_a = fields_a.get(name)
+        value_b = fields_b.get(name)
+        if value_a is None or value_b is None:
+            equal = value_a is value_b
+        elif isinstance(value_a, (str, unicode)):
+            equal = value_a == value_b
+        else:
+            equal = numpy.array_equal(numpy.asarray(value_a), \
+                numpy.asarray(value_b))
+        if not equal:
+            output.append((name, value_a, value_b))
+    return output
+
+
+def _decode(data, compression, endian, shape, gate_width):
+    """ Decode pulse data into (active, passive) arrays """
+    values = numpy.frombuffer(decode_payload(data, compression), \
+        dtype=endian + 'f8').reshape(shape)
+    return values[:, :, 1:], values[:, :, 0] * gate_width
+
+
+def _pulse_metrics(args):
+    """ Compare the pulse data of two pulses (run in a worker process) """
+    pulse_a, pulse_b = args
+    if pulse_a[3] != pulse_b[3]:
+        return (numpy.nan,) * 4 + (True,)
+    active_a, passive_a = _decode(*pulse_a)
+    active_b, passive_b = _decode(*pulse_b)
+    difference = active_b - active_a
+    if difference.size == 0:
+        max_abs_diff = 0.
+    else:
+        max_abs_diff = numpy.max(numpy.abs(difference))
+    norm = numpy.sqrt(numpy.sum(active_a ** 2))
+    error = numpy.sqrt(numpy.sum(difference ** 2))
+    if norm > 0:
+        relative_error = error / norm
+    elif error > 0:
+        relative_error = numpy.inf
+    else:
+        relative_error = 0.
+    return (max_abs_diff, relative_error, \
+        numpy.sum(active_b) - numpy.sum(active_a), \
+        numpy.max(numpy.abs(passive_b - passive_a)), False)
+
+
+class _LockstepFile(object):
+    """ Reads the headers and raw pulse data of a bin file in order """
+    def __init__(self, filename, is32bit=False):
+        self.fid = open_stream(filename)
+        self.is32bit = is32bit
+        try:
+            if self.fid.read(11) != "DIRSIGPROTO":
+                raise RuntimeError("'" + filename + \
+                    "' is not valid DIRSIG bin file.")
+            self.header = DirsigBinHeader().read(self.fid)
+        except Exception:
+            self.fid.close()
+            raise
+        self.version = self.header.file_format_version
+        self.endian = self.header.endian()
+
+    def task_header(self):
+        return DirsigBinTaskHeader().read(self.fid, self.version, self.endian)
+
+    def pulse(self):
+        """ Get the header and the (undecoded) pulse of the next pulse """
+        header = DirsigBinPulseHeader().read(self.fid, self.version, \
+            self.endian, is32bit=self.is32bit)
+        shape = (self.header.x_pixel_count, self.header.y_pixel_count, \
+            header.time_gate_bin_count * header.samples_per_time_bin + 1)
+        return header, (self.fid.read(header.pulse_data_bytes), \
+            header.data_compression_type, self.endian, shape, \
+            header.time_gate_stop - header.time_gate_start)
+
+    def skip_pulse(self):
+        header = DirsigBinPulseHeader().read(self.fid, self.version, \
+            self.endian, is32bit=self.is32bit)
+        self.fid.seek(header.pulse_data_bytes, 1)
+
+    def close(self):
+        self.fid.close()
+
+
+def diff_bins(file_a, file_b, processes=2, window=None, is32bit=False, \
+    ignore=IGNORED_FIELDS):
+    """Compares two bin files pulse by pulse.
+
+    Args:
+        file_a (str): The reference bin file (may be compressed, see
+            open_stream).
+        file_b (str): The bin file to compare to it.
+        processes (int, optional): The number of worker processes. If 1, the
+            pulses are compared in this process. The default is 2.
+        window (int, optional): The number of pairs of pulses to read before
+            comparing them. The default is None (4 per process).
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+        ignore (iterable, optional): The header fields not to compare. The
+            default is IGNORED_FIELDS.
+
+    Returns:
+        A tuple (header differences, metrics). The header differences are a
+        list of (location, field, value a, value b) tuples, where location is
+        'file', ('task', task) or ('pulse', task, pulse). The metrics are a
+        numpy.array of PULSE_DIFF_DTYPE with a row for each pair of pulses.
+        Pulses that are only in one of the files are not compared.
+
+    """
+    if window is None:
+        window = 4 * max(1, processes)
+    pool = None
+    reader_a = None
+    reader_b = None
+    differences = []
+    metrics = []
+    jobs = []
+    # the number of header differences of each pulse
+    counts = {}
+
+    def compare(jobs):
+        """ Compare a window of pulses """
+        if pool is None:
+            results = [_pulse_metrics(job[1]) for job in jobs]
+        else:
+            results = pool.map(_pulse_metrics, [job[1] for job in jobs])
+        for (key, dummy), result in zip(jobs, results):
+            metrics.append(key + result[0:4] + (counts.pop(key), result[4]))
+
+    try:
+        reader_a = _LockstepFile(file_a, is32bit=is32bit)
+        reader_b = _LockstepFile(file_b, is32bit=is32bit)
+        differences.extend([('file',) + diff for diff in \
+            diff_headers(reader_a.header, reader_b.header, ignore=ignore)])
+        if processes > 1:
+            pool = multiprocessing.Pool(processes=processes)
+        for task in range(min(reader_a.header.task_count, \
+            reader_b.header.task_count)):
+            task_a = reader_a.task_header()
+            task_b = reader_b.task_header()
+            differences.extend([(('task', task),) + diff for diff in \
+                diff_headers(task_a, task_b, ignore=ignore)])
+            for pulse in range(min(task_a.pulse_count, task_b.pulse_count)):
+                header_a, pulse_a = reader_a.pulse()
+                header_b, pulse_b = reader_b.pulse()
+                pulse_differences = diff_headers(header_a, header_b, \
+                    ignore=ignore)
+                differences.extend([(('pulse', task, pulse),) + diff for \
+                    diff in pulse_differences])
+                counts[(task, pulse)] = len(pulse_differences)
+                jobs.append(((task, pulse), (pulse_a, pulse_b)))
+                if len(jobs) == window:
+                    compare(jobs)
+                    jobs = []
+            # the extra pulses of the longer task
+            for dummy in range(task_b.pulse_count, task_a.pulse_count):
+                reader_a.skip_pulse()
+            for dummy in range(task_a.pulse_count, task_b.pulse_count):
+                reader_b.skip_pulse()
+        compare(jobs)
+    finally:
+        for reader in (reader_a, reader_b):
+            if reader is not None:
+                reader.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return differences, numpy.array(metrics, dtype=PULSE_DIFF_DTYPE)
+
+
+def report(differences, metrics, tolerance=1e-9):
+    """Makes a short text report of the output of diff_bins.
+
+    Args:
+        differences (list): The header differences.
+        metrics (numpy.array): The pulse metrics.
+        tolerance (float, optional): The relative error above which a pulse
+            is counted as different. The default is 1e-9.
+
+    Returns:
+        A str containing the report.
+
+    """
+    output = 'Header differences:   {0}\n'.format(len(differences))
+    for location, name, value_a, value_b in differences[:20]:
+        output += '    {0} {1}: {2!r} -> {3!r}\n'.format(location, name, \
+            value_a, value_b)
+    if len(differences) > 20:
+        output += '    ...\n'
+    errors = numpy.where(metrics['shape_mismatch'], 0., \
+        metrics['relative_error'])
+    different = (errors > tolerance) | metrics['shape_mismatch']
+    output += 'Pulses compared:      {0}\n'.format(len(metrics))
+    output += 'Pulses different:     {0}\n'.format(numpy.sum(different))
+    output += 'Shape mismatches:     {0}\n'.format( \
+        numpy.sum(metrics['shape_mismatch']))
+    if len(metrics) > 0 and not numpy.all(metrics['shape_mismatch']):
+        valid = metrics[~metrics['shape_mismatch']]
+        worst = valid[numpy.argmax(valid['relative_error'])]
+        output += 'Max abs difference:   {0}\n'.format( \
+            numpy.max(valid['max_abs_diff']))
+        output += 'Max relative error:   {0} (task {1}, pulse {2})\n'.format( \
+            worst['relative_error'], worst['task'], worst['pulse'])
+        output += 'Total energy change:  {0}\n'.format( \
+            numpy.sum(valid['energy_difference']))
+    return output
+
+
+if __name__ == '__main__':
+    import sys
+    ARGS = sys.argv[1:]
+
+    # set defaults
+    PROCESSES = 2
+    TOLERANCE = 1e-9
+    IS32BIT = False
+
+    if len(ARGS) < 2:
+        sys.exit('Usage: bindiff.py [options] file_a file_b')
+
+    for ARG in ARGS[:-2]:
+        if ARG.lower().startswith('--processes='):
+            PROCESSES = int(ARG[12:])
+        elif ARG.lower().startswith('--tolerance='):
+            TOLERANCE = float(ARG[12:])
+        elif ARG.lower() == '--32bit':
+            IS32BIT = True
+        else:
+            sys.exit("'" + ARG + "' is an unexpected command line option.")
+
+    DIFFERENCES, METRICS = diff_bins(ARGS[-2], ARGS[-1], \
+        processes=PROCESSES, is32bit=IS32BIT)
+    print report(DIFFERENCES, METRICS, tolerance=TOLERANCE)
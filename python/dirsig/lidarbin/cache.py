@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""This module provides a cache of decoded pulses.
+
+Description:
+    PulseCache keeps the most recently used decoded pulses, up to a number of
+    bytes of pulse data. When a new pulse does not fit, the least recently used
+    pulses are evicted. The number of hits, misses and evictions are counted,
+    so the size of the cache can be tuned.
+
+    The cache is safe to use from several threads. See DirsigBinReader and
+    browse in reader.py for how it is used.
+
+Usage:
+    cache = PulseCache(max_bytes=512 * 2 ** 20)
+    pulse = cache.fetch(row, lambda: index.read_pulses([row])[0])
+    print cache.info()
+
+External Dependancies:
+    threading
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import threading
+from collections import OrderedDict
+
+
+def pulse_bytes(pulse):
+    """ Get the number of bytes of the decoded data of a pulse """
+    return pulse.active.nbytes + pulse.passive.nbytes
+
+
+class PulseCache(object):
+    """ A least recently used cache of decoded pulses, bounded in bytes """
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pulses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pulses)
+
+    def __contains__(self, key):
+        return key in self._pulses
+
+    def __repr__(self):
+        return "Pulse cache with {0} pulses ({1} of {2} bytes)".format( \
+            len(self), self.nbytes, self.max_bytes)
+
+    def info(self):
+        """ Get a dict of the counters of the cache """
+        return {'hits': self.hits, 'misses': self.misses, \
+            'evictions': self.evictions, 'pulses': len(self), \
+            'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    def get(self, key):
+        """ Get a pulse, or None if it is not in the cache """
+        with self._lock:
+            pulse = self._pulses.pop(key, None)
+            if pulse is None:
+                self.misses += 1
+                return None
+            # move it to the most recently used end
+            self._pulses[key] = pulse
+            self.hits += 1
+            return pulse
+
+    def put(self, key, pulse):
+        """ Add a pulse, evicting the least recently used pulses to fit it
+
+        A pulse that is larger than the whole cache is not stored.
+        """
+        size = pulse_bytes(pulse)
+        with self._lock:
+            if key in self._pulses:
+                self.nbytes -= pulse_bytes(self._pulses.pop(key))
+            if size > self.max_bytes:
+                return
+            while self._pulses and self.nbytes + size > self.max_bytes:
+                self.nbytes -= pulse_bytes(self._pulses.popitem(last=False)[1])
+                self.evictions += 1
+            self._pulses[key] = pulse
+            self.nbytes += size
+
+    def fetch(self, key, load):
+        """ Get a pulse, calling load() to decode it if it is not cached """
+        pulse = self.get(key)
+        if pulse is None:
+            pulse = load()
+            self.put(key, pulse)
+        return pulse
+
+    def clear(self):
+        """ Remove every pulse (the counters are kept) """
+        with self._lock:
+            self._pulses.clear()
+            self.nbytes = 0
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""This module exports the pulse header tables of bin files as columns.
+
+Description:
+    The pulse header table of a DirsigBinIndex is flattened into columns: the
+    vectors and affines get a column per element (e.g. platform_location_0 or
+    receiver_to_mount_affine_1_3). The table of one or more bin files can be
+    written as:
+        - Parquet (.parquet) or Arrow IPC (.arrow, .feather) files, when
+          pyarrow is installed
+        - CSV (.csv) or structured numpy (.npy) files otherwise
+    so the trajectories and pulse layouts of many runs can be queried with
+    columnar tools without reading the binary headers again.
+
+Usage:
+    export_header_table(filenames, 'headers.parquet')
+
+External Dependancies:
+    numpy
+    pyarrow (optional)
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import csv
+import os
+from collections import OrderedDict
+import numpy
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+    _HAS_PYARROW_ = True
+except ImportError:
+    _HAS_PYARROW_ = False
+
+from dirsigbin import DirsigBinIndex
+
+
+def header_columns(table):
+    """Flattens a pulse header table into columns.
+
+    Args:
+        table (numpy.array): A pulse header table (see DirsigBinIndex).
+
+    Returns:
+        An OrderedDict of 1D numpy.arrays, in the order of the table fields.
+
+    """
+    output = OrderedDict()
+    for name in table.dtype.names:
+        values = table[name]
+        if values.ndim == 1:
+            output[name] = values
+            continue
+        for element in numpy.ndindex(values.shape[1:]):
+            output[name + ''.join('_{0}'.format(i) for i in element)] = \
+                values[(slice(None),) + element]
+    return output
+
+
+def _columns(filenames, is32bit=False):
+    """ Get the columns of the header tables of bin files, one after another """
+    files = []
+    tables = []
+    for filename in filenames:
+        index = DirsigBinIndex().build(filename, is32bit=is32bit)
+        files.extend([filename] * len(index))
+        tables.append(index.table)
+    output = OrderedDict()
+    output['file'] = numpy.array(files, dtype=str)
+    output.update(header_columns(numpy.concatenate(tables)))
+    return output
+
+
+def _csv_column(values):
+    """ Format a column as CSV strings, by the kind of its values """
+    if values.dtype.kind == 'f':
+        # repr keeps every digit of the doubles
+        return [repr(float(value)) for value in values]
+    elif values.dtype.kind in 'iub':
+        return [str(int(value)) for value in values]
+    elif values.dtype.kind == 'U':
+        return [value.encode('utf-8') for value in values.tolist()]
+    return [str(value) for value in values.tolist()]
+
+
+def export_header_table(filenames, outfile, is32bit=False):
+    """Writes the pulse header tables of bin files as one columnar table.
+
+    The format is chosen from the extension of outfile. If pyarrow is not
+    installed, .parquet, .arrow and .feather files are written as .csv files
+    next to outfile instead.
+
+    Args:
+        filenames (list): The bin files. The file column holds the name of the
+            bin file of each row.
+        outfile (str): The file to write (.parquet, .arrow, .feather, .csv or
+            .npy).
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        The name of the file that was written.
+
+    """
+    if isinstance(filenames, basestring):
+        filenames = [filenames]
+    if len(filenames) == 0:
+        raise ValueError('No bin files were given.')
+    columns = _columns(filenames, is32bit=is32bit)
+    base, extension = os.path.splitext(outfile)
+    extension = extension.lower()
+    if extension in ('.parquet', '.arrow', '.feather'):
+        if _HAS_PYARROW_:
+            table = pyarrow.Table.from_arrays( \
+                [pyarrow.array(values) for values in columns.values()], \
+                names=list(columns.keys()))
+            if extension == '.parquet':
+                pyarrow.parquet.write_table(table, outfile)
+            else:
+                pyarrow.feather.write_feather(table, outfile)
+            return outfile
+        outfile = base + '.csv'
+        extension = '.csv'
+
+    if extension == '.npy':
+        output = numpy.empty(len(columns['file']), dtype=[(name, \
+            values.dtype) for name, values in columns.items()])
+        for name, values in columns.items():
+            output[name] = values
+        numpy.save(outfile, output)
+    elif extension == '.csv':
+        with open(outfile, 'wb') as fid:
+            writer = csv.writer(fid)
+            writer.writerow(list(columns.keys()))
+            writer.writerows(zip(*[_csv_column(values) for values in \
+                columns.values()]))
+    else:
+        raise ValueError("Unknown table format '{0}'".format(extension))
+    return outfile
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+"""This module decomposes full waveforms into Gaussian returns.
+
+Description:
+    Each pixel waveform is modeled as a sum of up to max_returns Gaussians,
+        w(t) = sum_k a_k exp(-(t - r_k)^2 / (2 s_k^2))
+    The initial guesses are the largest local maxima of each waveform. The
+    amplitudes, positions and widths are then fit by Levenberg-Marquardt
+    iterations that are vectorized over a batch of waveforms: the Jacobians
+    and normal equations of the whole batch are built with numpy, and solved
+    with one stacked numpy.linalg.solve. Each waveform has its own damping,
+    so it converges (or not) independently of the rest of the batch.
+
+    The returns are stored in a structured array of GAUSSIAN_DTYPE with a
+    trailing axis of max_returns. Returns that were not found have valid set
+    to False and NaN parameters.
+
+Usage:
+    To decompose every pixel waveform of a task:
+        binfile = dirsig.lidarbin.DirsigBin()
+        binfile.read(filename)
+        returns = decompose_pulses(binfile[0].pulses, max_returns=3)
+        ranges = returns['range'][returns['valid']]
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+from noise import stack_signals
+
+# a Gaussian return. range and width (the standard deviation) are in the
+# units of the time axis given to decompose
+GAUSSIAN_DTYPE = numpy.dtype([
+    ('amplitude', 'f8'),
+    ('range', 'f8'),
+    ('width', 'f8'),
+    ('valid', '?')])
+
+
+def find_peaks(waveforms, max_returns=3, threshold=0.1):
+    """Finds the largest local maxima of each waveform.
+
+    Args:
+        waveforms (numpy.array): The waveforms (n, bins).
+        max_returns (int, optional): The number of peaks to find. The default
+            is 3.
+        threshold (float, optional): Peaks smaller than this fraction of the
+            largest value of the waveform are ignored. The default is 0.1.
+
+    Returns:
+        A tuple (bins, found) of (n, max_returns) numpy.arrays: the time bin
+        of each peak (largest first) and whether it was found.
+
+    """
+    waveforms = numpy.asarray(waveforms, dtype=float)
+    padded = numpy.pad(waveforms, ((0, 0), (1, 1)), 'constant', \
+        constant_values=-numpy.inf)
+    is_peak = (waveforms > padded[:, :-2]) & (waveforms >= padded[:, 2:]) & \
+        (waveforms > threshold * numpy.max(waveforms, axis=1)[:, None]) & \
+        (waveforms > 0)
+    heights = numpy.where(is_peak, waveforms, -numpy.inf)
+    order = numpy.argsort(-heights, axis=1, kind='mergesort')[:, :max_returns]
+    found = numpy.isfinite(heights[numpy.arange(len(heights))[:, None], order])
+    if order.shape[1] < max_returns:
+        # waveforms with fewer bins than returns
+        pad = max_returns - order.shape[1]
+        order = numpy.pad(order, ((0, 0), (0, pad)), 'constant')
+        found = numpy.pad(found, ((0, 0), (0, pad)), 'constant')
+    return order, found
+
+
+def _model(params, time):
+    """ Get the model waveforms and the Gaussian terms """
+    amplitude = params[:, 0::3, None]
+    offset = time[None, None, :] - params[:, 1::3, None]
+    width = params[:, 2::3, None]
+    gaussian = numpy.exp(-0.5 * (offset / width) ** 2)
+    return numpy.sum(amplitude * gaussian, axis=1), gaussian, offset
+
+
+def _jacobian(params, gaussian, offset):
+    """ Get the Jacobian of the model (n, bins, 3 * returns) """
+    amplitude = params[:, 0::3, None]
+    width = params[:, 2::3, None]
+    n, returns, bins = gaussian.shape
+    jacobian = numpy.empty((n, returns, 3, bins))
+    jacobian[:, :, 0] = gaussian
+    jacobian[:, :, 1] = amplitude * gaussian * offset / width ** 2
+    jacobian[:, :, 2] = amplitude * gaussian * offset ** 2 / width ** 3
+    return jacobian.reshape((n, 3 * returns, bins)).transpose((0, 2, 1))
+
+
+def fit_gaussians(waveforms, params, active, iterations=50, tolerance=1e-8):
+    """Fits sums of Gaussians to waveforms by Levenberg-Marquardt.
+
+    Args:
+        waveforms (numpy.array): The waveforms (n, bins).
+        params (numpy.array): The initial (amplitude, position, width) of each
+            return, in time bins (n, 3 * returns).
+        active (numpy.array): Which returns to fit (n, returns). Inactive
+            returns are held at an amplitude of 0.
+        iterations (int, optional): The largest number of iterations. The
+            default is 50.
+        tolerance (float, optional): Waveforms stop once the relative change
+            of their cost is below this. The default is 1e-8.
+
+    Returns:
+        A tuple (params, cost) of the fitted parameters and the sum of the
+        squared residuals of each waveform.
+
+    """
+    waveforms = numpy.asarray(waveforms, dtype=float)
+    params = numpy.array(params, dtype=float)
+    n, bins = waveforms.shape
+    time = numpy.arange(bins, dtype=float)
+    free = numpy.repeat(active, 3, axis=1).astype(float)
+    params[:, 0::3] *= active
+    damping = 1e-3 * numpy.ones(n)
+    model = _model(params, time)
+    cost = numpy.sum((waveforms - model[0]) ** 2, axis=1)
+    running = numpy.ones(n, dtype=bool)
+    identity = numpy.eye(params.shape[1])
+    for dummy in range(iterations):
+        rows = numpy.flatnonzero(running)
+        if len(rows) == 0:
+            break
+        model_rows, gaussian, offset = _model(params[rows], time)
+        jacobian = _jacobian(params[rows], gaussian, offset) * \
+            free[rows, None, :]
+        residual = waveforms[rows] - model_rows
+        normal = numpy.einsum('nbi,nbj->nij', jacobian, jacobian)
+        gradient = numpy.einsum('nbi,nb->ni', jacobian, residual)
+        diagonal = numpy.diagonal(normal, axis1=1, axis2=2)
+        # the identity keeps the fixed (inactive) parameters solvable
+        system = normal + (damping[rows, None] * diagonal)[:, :, None] * \
+            identity + 1e-12 * identity
+        step = numpy.linalg.solve(system, gradient[:, :, None])[:, :, 0]
+        trial = params[rows] + step * free[rows]
+        trial[:, 0::3] = numpy.maximum(trial[:, 0::3], 0.)
+        trial[:, 2::3] = numpy.maximum(numpy.abs(trial[:, 2::3]), 1e-3)
+        trial_cost = numpy.sum((waveforms[rows] - _model(trial, time)[0]) ** \
+            2, axis=1)
+
+        better = trial_cost < cost[rows]
+        change = (cost[rows] - trial_cost) / numpy.maximum(cost[rows], 1e-300)
+        params[rows[better]] = trial[better]
+        running[rows[better & (change < tolerance)]] = False
+        cost[rows[better]] = trial_cost[better]
+        damping[rows] = numpy.where(better, damping[rows] / 10., \
+            damping[rows] * 10.)
+        # give up on waveforms whose steps keep failing
+        running[rows[damping[rows] > 1e10]] = False
+    return params, cost
+
+
+def decompose(waveforms, max_returns=3, threshold=0.1, width=1.0, \
+    start=0., step=1., iterations=50, batch_size=4096):
+    """Decomposes waveforms into Gaussian returns.
+
+    Args:
+        waveforms (numpy.array): The waveforms (..., bins).
+        max_returns (int, optional): The largest number of returns per
+            waveform. The default is 3.
+        threshold (float, optional): See find_peaks. The default is 0.1.
+        width (float, optional): The initial width of the returns in time
+            bins. The default is 1.
+        start (float, optional): The time (or range) of the first bin. The
+            default is 0.
+        step (float, optional): The time (or range) between bins. The default
+            is 1.
+        iterations (int, optional): See fit_gaussians. The default is 50.
+        batch_size (int, optional): The number of waveforms to fit at once.
+            The default is 4096.
+
+    Returns:
+        A numpy.array of GAUSSIAN_DTYPE of size waveforms.shape[:-1] x
+        max_returns. range and width are in the units of start and step.
+
+    """
+    waveforms = numpy.asarray(waveforms, dtype=float)
+    shape = waveforms.shape[:-1]
+    waveforms = waveforms.reshape((-1, waveforms.shape[-1]))
+    output = numpy.zeros((len(waveforms), max_returns), dtype=GAUSSIAN_DTYPE)
+    for first in range(0, len(waveforms), batch_size):
+        batch = waveforms[first:first + batch_size]
+        peaks, found = find_peaks(batch, max_returns=max_returns, \
+            threshold=threshold)
+        params = numpy.empty((len(batch), 3 * max_returns))
+        params[:, 0::3] = batch[numpy.arange(len(batch))[:, None], peaks]
+        params[:, 1::3] = peaks
+        params[:, 2::3] = width
+        params = fit_gaussians(batch, params, found, iterations=iterations)[0]
+
+        returns = output[first:first + batch_size]
+        returns['valid'] = found & (params[:, 0::3] > 0)
+        returns['amplitude'] = params[:, 0::3]
+        returns['range'] = start + step * params[:, 1::3]
+        returns['width'] = abs(step) * params[:, 2::3]
+        for name in ('amplitude', 'range', 'width'):
+            returns[name][~returns['valid']] = numpy.nan
+    return output.reshape(shape + (max_returns,))
+
+
+def decompose_pulses(pulses, max_returns=3, threshold=0.1, \
+    index_of_refraction=1.0, signal=False, **kwargs):
+    """Decomposes every pixel waveform of pulses into Gaussian returns.
+
+    Args:
+        pulses (list): DirsigBinPulses that all have the same time gate and
+            shape.
+        max_returns (int, optional): See decompose. The default is 3.
+        threshold (float, optional): See find_peaks. The default is 0.1.
+        index_of_refraction (float, optional): The default is 1.
+        signal (bool, optional): Decompose the signal (active + passive)
+            instead of the active term. The default is False.
+        **kwargs: Passed on to decompose.
+
+    Returns:
+        A numpy.array of GAUSSIAN_DTYPE of size pulses x X x Y x max_returns,
+        with range and width in meters.
+
+    """
+    if len(pulses) == 0:
+        return numpy.zeros((0, 0, 0, max_returns), dtype=GAUSSIAN_DTYPE)
+    if signal:
+        waveforms = stack_signals(pulses)
+    else:
+        waveforms = stack_signals([pulse.active for pulse in pulses])
+    ranges = pulses[0].get_range()
+    return decompose(waveforms, max_returns=max_returns, threshold=threshold, \
+        start=ranges[0] / index_of_refraction, step=(ranges[-1] - ranges[0]) / \
+        max(len(ranges) - 1, 1) / index_of_refraction, **kwargs)
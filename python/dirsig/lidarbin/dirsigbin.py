@@ -20,11 +20,21 @@ Usage:
             binfile = dirsig.lidar.DirsigBin()
             binfile.read(filename, True)
 
+    To decode only some of the pulses of a bin file:
+        binfile = dirsig.lidarbin.DirsigBin()
+        binfile.scan(filename)
+        pulses = binfile.select(time_range=(start, stop), task=0)
+
+    To keep a bin file open and decode slices of pulses on demand:
+        with dirsig.lidarbin.DirsigBin.open(filename) as binfile:
+            batch = binfile[0, 100:200]
+            active = batch.active
+
 External Dependancies:
 	numpy
 	struct
 	sys
-	zlib
+	zlib (and the other codecs of bincodec.py)
 
 Warnings:
     This code has not been tested on a version 0 bin file.
@@ -54,7 +64,10 @@ __status__ = "Production"
 import sys     # stderr and command-line arguments
 import numpy   # base data type for signals
 import struct  # for convertint data types
-import zlib    # for decompression
+import os      # to check that there is a file to index
+
+from bincodec import decode_payload, payload_values  # for decompression
+from spill import SpillStore  # for reading within a memory budget
 
 class DirsigBinHeader(object):
     """ A class for the bin file header """
@@ -431,6 +444,8 @@ class DirsigBinTask(object):
     """ A class for a dirsig bin task """
     def __init__(self, arg=None):
         try:
+            # decodes a pulse on demand (see browse in reader.py)
+            self.loader = None
             if arg == None:
                 self.header = None
                 self.pulses = []
@@ -442,18 +457,37 @@ class DirsigBinTask(object):
             raise
 
     def __len__(self):
+        if self.is_lazy():
+            return self.npulses()
         return len(self.pulses)
 
     def __getitem__(self, pulseindex):
+        if self.is_lazy():
+            if isinstance(pulseindex, slice):
+                return [self.loader(number) for number in \
+                    range(*pulseindex.indices(self.npulses()))]
+            if pulseindex < 0:
+                pulseindex += self.npulses()
+            if not 0 <= pulseindex < self.npulses():
+                raise IndexError('pulse index out of range')
+            return self.loader(pulseindex)
         try:
             return self.pulses[pulseindex]
         except Exception:
             raise
 
     def __iter__(self):
+        if self.is_lazy():
+            for pulseindex in range(self.npulses()):
+                yield self.loader(pulseindex)
+            return
         for pulse in self.pulses:
             yield pulse
 
+    def is_lazy(self):
+        """ Check if the pulses are decoded on demand by the loader """
+        return self.loader is not None and len(self.pulses) < self.npulses()
+
     def __str__(self):
         output = '{0}\n'.format(self.header)
         for pulse in self.pulses:
@@ -467,8 +501,12 @@ class DirsigBinTask(object):
         """ Returns the number of pulses """
         return self.header.pulse_count
 
-    def read(self, fid, version, endian, x_pix_ct, y_pix_ct, is32bit=False):
-        """ Read a task """
+    def read(self, fid, version, endian, x_pix_ct, y_pix_ct, is32bit=False, \
+        sum_samples=False, rebin=1, spill=None):
+        """ Read a task (see DirsigBinPulse.read for sum_samples and rebin)
+
+        If spill (a SpillStore) is given, each pulse is placed by it.
+        """
         try:
             self.header = DirsigBinTaskHeader()
             self.header.read(fid, version, endian)
@@ -476,13 +514,63 @@ class DirsigBinTask(object):
             for dummypulse in range(self.header.pulse_count):
                 pulse = DirsigBinPulse()
                 pulse.read(fid, version, endian, x_pix_ct, y_pix_ct, \
-                    is32bit=is32bit)
+                    is32bit=is32bit, sum_samples=sum_samples, rebin=rebin)
+                if spill is not None:
+                    spill.place(pulse)
                 self.pulses.append(DirsigBinPulse(pulse))
         except Exception:
             raise
 
 
 
+# The columns of the pulse statistics table. The peak bin is the time bin of
+# the largest active value (not its sample within the bin), and the peak pixel is the (flattened) pixel of the
+# largest passive value.
+PULSE_STATS_DTYPE = numpy.dtype([
+    ('active_min', 'f8'),
+    ('active_max', 'f8'),
+    ('active_sum', 'f8'),
+    ('active_peak_bin', 'i8'),
+    ('active_nonzero', 'i8'),
+    ('passive_min', 'f8'),
+    ('passive_max', 'f8'),
+    ('passive_sum', 'f8'),
+    ('passive_peak_pixel', 'i8'),
+    ('passive_nonzero', 'i8')])
+
+
+def pulse_statistics(active, passive, samples=1):
+    """Computes the statistics of a pulse.
+
+    Args:
+        active (numpy.array): The active term of the pulse
+            (..., bins * samples).
+        passive (numpy.array): The passive term of the pulse.
+        samples (int, optional): The number of samples per time bin of the
+            active term. The default is 1.
+
+    Returns:
+        A numpy.void record with the fields of PULSE_STATS_DTYPE.
+
+    """
+    output = numpy.zeros((), dtype=PULSE_STATS_DTYPE)
+    for name, values in (('active', active), ('passive', passive)):
+        values = numpy.ravel(values)
+        if values.size == 0:
+            continue
+        peak = numpy.argmax(values)
+        output[name + '_min'] = numpy.min(values)
+        output[name + '_max'] = values[peak]
+        output[name + '_sum'] = numpy.sum(values)
+        output[name + '_nonzero'] = numpy.count_nonzero(values)
+        if name == 'active':
+            output['active_peak_bin'] = \
+                (peak % numpy.shape(active)[-1]) // max(1, samples)
+        else:
+            output['passive_peak_pixel'] = peak
+    return output[()]
+
+
 class DirsigBinPulse(object):
     """ A class for a dirsig bin pulse """
     def __init__(self, arg=None):
@@ -491,10 +579,12 @@ class DirsigBinPulse(object):
                 self.header = None
                 self.passive = numpy.empty([])
                 self.active = numpy.empty([])
+                self.stats = None
             elif isinstance(arg, DirsigBinPulse):
                 self.header = DirsigBinPulseHeader(arg.header)
                 self.passive = arg.passive
                 self.active = arg.active
+                self.stats = arg.stats
         except Exception:
             raise
 
@@ -512,10 +602,11 @@ class DirsigBinPulse(object):
             self.time_to_range(self.header.time_gate_start))
         output += 'Range Gate Close:     {0} [s] ({1} [m])\n'.format(self.header.time_gate_stop, \
             self.time_to_range(self.header.time_gate_stop))
-        output += 'Max Passive Signal:   {0} [phot/bin]\n'.format(numpy.max(self.passive))
-        output += 'Min Passive Singal:   {0} [phot/bin]\n'.format(numpy.min(self.passive))
-        output += 'Max Active Signal:    {0} [phot/bin]\n'.format(numpy.max(self.active))
-        output += 'Min Active Singal:    {0} [phot/bin]\n'.format(numpy.min(self.active))
+        stats = self.statistics()
+        output += 'Max Passive Signal:   {0} [phot/bin]\n'.format(stats['passive_max'])
+        output += 'Min Passive Singal:   {0} [phot/bin]\n'.format(stats['passive_min'])
+        output += 'Max Active Signal:    {0} [phot/bin]\n'.format(stats['active_max'])
+        output += 'Min Active Singal:    {0} [phot/bin]\n'.format(stats['active_min'])
         return output
 
     def __repr__(self):
@@ -526,10 +617,11 @@ class DirsigBinPulse(object):
         output += 'Samples per Time Bin: {0}\n'.format(self.header.samples_per_time_bin)
         output += 'Array size            {0}x{0}\n'.format(self.array_size()[0], \
             self.array_size()[1])
-        output += 'Max Passive Signal:   {0} [phot/bin]\n'.format(numpy.max(self.passive))
-        output += 'Min Passive Singal:   {0} [phot/bin]\n'.format(numpy.min(self.passive))
-        output += 'Max Active Signal:    {0} [phot/bin]\n'.format(numpy.max(self.active))
-        output += 'Min Active Singal:    {0} [phot/bin]\n'.format(numpy.min(self.active))
+        stats = self.statistics()
+        output += 'Max Passive Signal:   {0} [phot/bin]\n'.format(stats['passive_max'])
+        output += 'Min Passive Singal:   {0} [phot/bin]\n'.format(stats['passive_min'])
+        output += 'Max Active Signal:    {0} [phot/bin]\n'.format(stats['active_max'])
+        output += 'Min Active Singal:    {0} [phot/bin]\n'.format(stats['active_min'])
         return output
 
     def time_to_range(self, time, index_of_refraction=1.0):
@@ -541,8 +633,19 @@ class DirsigBinPulse(object):
         self.header = None
         self.active = numpy.empty([])
         self.passive = numpy.empty([])
+        self.stats = None
         return self
 
+    def statistics(self):
+        """ Get the statistics of the pulse (see PULSE_STATS_DTYPE) """
+        if self.stats is None:
+            samples = 1
+            if self.header is not None:
+                samples = self.header.samples_per_time_bin
+            self.stats = pulse_statistics(self.active, self.passive, \
+                samples=samples)
+        return self.stats
+
     def shape(self):
         """ Get the shape of the active part of the signal """
         return self.active.shape
@@ -577,8 +680,9 @@ class DirsigBinPulse(object):
 
     def get_signal(self):
         """ Get the Singal """
-        s = self.passive.shape
-        return self.active + numpy.reshape(self.passive, (s[0], s[1], 1))
+        # single pixel pulses have a 1D active term and a scalar passive term
+        return self.active + numpy.reshape(self.passive, \
+            numpy.shape(self.passive) + (1,))
 
     def get_time(self):
         """ Get the time to the bins """
@@ -587,29 +691,31 @@ class DirsigBinPulse(object):
 
     def get_range(self):
         """ Get the range to the time bins """
-        return time_to_range(self.get_time())
+        return self.time_to_range(self.get_time())
+
+    def read(self, fid, version, endian, xpixelct, ypixelct, is32bit=False, \
+        sum_samples=False, rebin=1):
+        """ reads a pulse
 
-    def read(self, fid, version, endian, xpixelct, ypixelct, is32bit=False):
-        """ reads a pulse """
+        If sum_samples is True, the samples of each time bin are summed. If
+        rebin is more than 1, every rebin time bins are summed into one. The
+        header is changed to describe the reduced active term.
+        """
 
         # read the header
         self.clear()
         self.header = DirsigBinPulseHeader()
         self.header.read(fid, version, endian, is32bit=is32bit)
 
-        tmp = fid.read(self.header.pulse_data_bytes)
-        if self.header.data_compression_type == 1:
-            tmp = zlib.decompress(tmp)
+        tmp = decode_payload(fid.read(self.header.pulse_data_bytes), \
+            self.header.data_compression_type)
 
         # How many active bins do we have?
         active_bin_ct = self.header.samples_per_time_bin * \
             self.header.time_gate_bin_count
 
-        # convert to doubles
-        tmp = struct.unpack(xpixelct * ypixelct * (active_bin_ct + 1) * 'd', tmp)
-
-        # store in numpy.array
-        tmp = numpy.reshape(numpy.array(tmp), \
+        # convert to native doubles (the data has the byte order of the file)
+        tmp = numpy.reshape(payload_values(tmp, endian), \
             (xpixelct, ypixelct, active_bin_ct + 1))
 
         # separate into active and passive terms
@@ -619,14 +725,419 @@ class DirsigBinPulse(object):
             self.passive = numpy.squeeze(tmp[:, :, 0]) * self.range_gate_width()
         else:
             self.active = tmp[:, :, 1:]
-            self.passive = numpy.squeeze(tmp[:, :, 0], axis=2) * \
-                self.range_gate_width()
+            self.passive = tmp[:, :, 0] * self.range_gate_width()
+        if sum_samples or rebin > 1:
+            self.active = reduce_time_bins(self.active, self.header, \
+                sum_samples=sum_samples, rebin=rebin)
+        self.stats = pulse_statistics(self.active, self.passive, \
+            samples=self.header.samples_per_time_bin)
+        return self
+
+
+def reduce_time_bins(active, header, sum_samples=False, rebin=1):
+    """Sums the samples of each time bin, and groups of time bins.
+
+    The header is changed to match: samples per time bin becomes 1 if the
+    samples are summed, and the time gate bin count is divided by rebin. If
+    the bin count is not a multiple of rebin, the last bin is padded with
+    zeros and the time gate stop is moved out to the end of it.
+
+    Args:
+        active (numpy.array): The active term, (x, y, bins * samples) or
+            (bins * samples).
+        header (DirsigBinPulseHeader): The header of the pulse.
+        sum_samples (bool, optional): Sum the samples of each time bin. The
+            default is False.
+        rebin (int, optional): The number of time bins to sum into one. The
+            default is 1.
+
+    Returns:
+        A numpy.array containing the reduced active term.
+
+    """
+    samples = header.samples_per_time_bin
+    bins = header.time_gate_bin_count
+    if sum_samples:
+        # the samples of a time bin are next to each other
+        active = active.reshape(active.shape[:-1] + (bins, samples)).sum( \
+            axis=-1)
+        header.samples_per_time_bin = samples = 1
+    if rebin > 1:
+        count = -(-bins // rebin)
+        padding = count * rebin - bins
+        if padding:
+            active = numpy.concatenate((active, numpy.zeros( \
+                active.shape[:-1] + (padding * samples,))), axis=-1)
+            header.time_gate_stop += padding * \
+                (header.time_gate_stop - header.time_gate_start) / bins
+        # sum the same sample of rebin neighboring bins
+        active = active.reshape(active.shape[:-1] + (count, rebin, \
+            samples)).sum(axis=-2).reshape(active.shape[:-1] + (-1,))
+        header.time_gate_bin_count = count
+    return active
+
+
+# The columns of the pulse header table. The names match the attributes of
+# DirsigBinPulseHeader. Fields that are not in a given version of the bin file
+# are filled with NaN (or empty strings for the rotation orders).
+PULSE_TABLE_DTYPE = numpy.dtype([
+    ('task', 'u4'),
+    ('pulse', 'u4'),
+    ('header_offset', 'u8'),
+    ('data_offset', 'u8'),
+    ('pulse_time', 'f8'),
+    ('time_gate_start', 'f8'),
+    ('time_gate_stop', 'f8'),
+    ('time_gate_bin_count', 'u4'),
+    ('samples_per_time_bin', 'u4'),
+    ('platform_location', 'f8', (3,)),
+    ('platform_orientation_angle_order', 'S3'),
+    ('platform_rotation', 'f8', (3,)),
+    ('transmitter_to_mount_affine', 'f8', (4, 4)),
+    ('transmitter_mount_pointing_offset', 'f8', (3,)),
+    ('transmitter_mount_pointing_rotation', 'f8', (3,)),
+    ('transmitter_mount_to_platform_affine', 'f8', (4, 4)),
+    ('receiver_to_mount_affine', 'f8', (4, 4)),
+    ('receiver_mount_pointing_offset', 'f8', (3,)),
+    ('receiver_orientation_angle_order', 'S3'),
+    ('receiver_mount_pointing_rotation', 'f8', (3,)),
+    ('receiver_mount_to_platform_affine', 'f8', (4, 4)),
+    ('pulse_data_type', 'u4'),
+    ('data_compression_type', 'u1'),
+    ('pulse_index', 'u4'),
+    ('pulse_data_bytes', 'u8')])
+
+
+def pulse_header_dtype(version, endian, is32bit=False):
+    """Gets the layout of a pulse header in a bin file as a numpy.dtype.
+
+    The fields are packed and have the byte order of the file, so a buffer of
+    pulse headers can be viewed with numpy.frombuffer and converted to native
+    values for all of the pulses at once. The field names match the
+    attributes of DirsigBinPulseHeader.
+
+    Args:
+        version (int): The version of the bin file.
+        endian (str): The byte order of the bin file, '<' or '>'.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A numpy.dtype.
+
+    """
+    double = endian + 'f8'
+    fields = [('pulse_time', double), ('time_gate_start', double), \
+        ('time_gate_stop', double), ('time_gate_bin_count', endian + 'u4')]
+    if version > 0:
+        fields.append(('samples_per_time_bin', endian + 'u4'))
+    fields.append(('platform_location', double, (3,)))
+    if version < 2:
+        fields.append(('platform_orientation_angle_order', 'S3'))
+    fields.append(('platform_rotation', double, (3,)))
+    if version > 1:
+        fields.append(('transmitter_to_mount_affine', double, (4, 4)))
+    else:
+        fields.extend([('transmitter_mount_pointing_offset', double, (3,)), \
+            ('tranmitter_orientation_angle_order', 'S3')])
+    fields.append(('transmitter_mount_pointing_rotation', double, (3,)))
+    if version > 1:
+        fields.extend([ \
+            ('transmitter_mount_to_platform_affine', double, (4, 4)), \
+            ('receiver_to_mount_affine', double, (4, 4))])
+    else:
+        fields.extend([('receiver_mount_pointing_offset', double, (3,)), \
+            ('receiver_orientation_angle_order', 'S3')])
+    fields.append(('receiver_mount_pointing_rotation', double, (3,)))
+    if version > 1:
+        fields.append(('receiver_mount_to_platform_affine', double, (4, 4)))
+    fields.extend([('pulse_data_type', endian + 'u4'), \
+        ('data_compression_type', 'u1')])
+    if version > 1:
+        fields.append(('pulse_index', endian + 'u4'))
+    else:
+        fields.append(('delta_histogram_flag', 'u1'))
+    # a long may be 32 bits on some systems and 64 on others
+    if is32bit and (version < 2):
+        fields.append(('pulse_data_bytes', endian + 'u4'))
+    else:
+        fields.append(('pulse_data_bytes', endian + 'u8'))
+    if version > 1:
+        fields.extend([('system_transmit_mueller_matrix', double, (4, 4)), \
+            ('system_receive_mueller_matrix', double, (4, 4))])
+    return numpy.dtype(fields)
+
+
+def _empty_stats(count):
+    """ Make a pulse statistics table that has not been filled in """
+    output = numpy.zeros(count, dtype=PULSE_STATS_DTYPE)
+    for name in PULSE_STATS_DTYPE.names:
+        if PULSE_STATS_DTYPE[name].kind == 'f':
+            output[name] = numpy.nan
+        else:
+            output[name] = -1
+    return output
+
+
+class DirsigBinIndex(object):
+    """ A table of the pulse headers and file offsets of a bin file
+
+    The index is built by reading every header of the file and skipping over
+    the pulse data. Pulses can then be decoded one at a time without reading
+    the rest of the file.
+
+    The statistics of each pulse (see PULSE_STATS_DTYPE) are kept in stats,
+    next to the table. They are filled in as pulses are decoded, or all at
+    once by compute_stats. Rows that have not been decoded are NaN (or -1).
+    """
+    def __init__(self):
+        self.filename = None
+        self.is32bit = False
+        self.header = None
+        self.task_headers = []
+        self.task_offsets = numpy.zeros(1, dtype=int)
+        self.table = numpy.empty(0, dtype=PULSE_TABLE_DTYPE)
+        self.stats = _empty_stats(0)
+        self._time_order = None
+        self._pulse_index_order = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def build(self, filename, is32bit=False):
+        """ Build the index by scanning the headers of a bin file
+
+        The raw pulse headers are collected as they are skipped over, and are
+        converted into the table (with the byte order of the file) all at
+        once (see pulse_header_dtype).
+        """
+        self.__init__()
+        self.filename = filename
+        self.is32bit = is32bit
+        raw_headers = []
+        offsets = [0]
+        header_offsets = []
+        fid = open(filename, 'rb')
+        try:
+            if fid.read(11) != "DIRSIGPROTO":
+                raise RuntimeError("'" + filename + \
+                    "' is not valid DIRSIG bin file.")
+            self.header = DirsigBinHeader().read(fid)
+            version = self.header.file_format_version
+            endian = self.header.endian()
+            header_dtype = pulse_header_dtype(version, endian, is32bit=is32bit)
+            size_field = header_dtype.fields['pulse_data_bytes']
+            size_format = endian + ('I' if size_field[0].itemsize == 4 else 'Q')
+            for task in range(self.header.task_count):
+                task_header = DirsigBinTaskHeader().read(fid, version, endian)
+                self.task_headers.append(task_header)
+                for dummypulse in range(task_header.pulse_count):
+                    header_offsets.append(fid.tell())
+                    raw = fid.read(header_dtype.itemsize)
+                    if len(raw) < header_dtype.itemsize:
+                        raise RuntimeError("'" + filename + \
+                            "' ends in the middle of a pulse header.")
+                    raw_headers.append(raw)
+                    # skip over the pulse data
+                    fid.seek(struct.unpack_from(size_format, raw, \
+                        size_field[1])[0], 1)
+                offsets.append(len(raw_headers))
+        finally:
+            fid.close()
+        if raw_headers:
+            headers = numpy.frombuffer(''.join(raw_headers), dtype=header_dtype)
+        else:
+            headers = numpy.empty(0, dtype=header_dtype)
+        self.table = numpy.zeros(len(headers), dtype=PULSE_TABLE_DTYPE)
+        for name in PULSE_TABLE_DTYPE.names:
+            if name in header_dtype.names:
+                self.table[name] = headers[name]
+            elif PULSE_TABLE_DTYPE[name].base.kind == 'f':
+                # fields that are not in this version of the bin file
+                self.table[name] = numpy.nan
+        self.table['task'] = numpy.repeat(numpy.arange(len(offsets) - 1), \
+            numpy.diff(offsets))
+        self.table['pulse'] = numpy.arange(len(headers)) - \
+            numpy.repeat(offsets[:-1], numpy.diff(offsets))
+        self.table['header_offset'] = header_offsets
+        self.table['data_offset'] = numpy.asarray(header_offsets, \
+            dtype=numpy.uint64) + header_dtype.itemsize
+        if version < 1:
+            # Just make a guess
+            self.table['samples_per_time_bin'] = 1
+        if version < 2:
+            # older files do not store a pulse index
+            self.table['pulse_index'] = self.table['pulse']
+        self.stats = _empty_stats(len(headers))
+        self.task_offsets = numpy.array(offsets, dtype=int)
         return self
 
+    def task_rows(self, task):
+        """ Get the rows of the table that belong to a task """
+        return numpy.arange(self.task_offsets[task], \
+            self.task_offsets[task + 1])
+
+    def find(self, time_range=None, pulse_index=None, task=None):
+        """Finds the pulses that match a query.
+
+        The pulse times and pulse indices are sorted once, and each query is a
+        binary search of the sorted values.
+
+        Args:
+            time_range (tuple, optional): The (first, last) pulse time to
+                select. Both ends are included. The default is None (any time).
+            pulse_index (int or tuple, optional): A pulse index, or the
+                (first, last) pulse indices to select. Both ends are included.
+                The default is None (any pulse index).
+            task (int, optional): The task to select. The default is None (all
+                tasks).
+
+        Returns:
+            A numpy.array containing the matching rows of the table in file
+            order.
+
+        """
+        if task is None:
+            rows = numpy.arange(len(self.table))
+        else:
+            rows = self.task_rows(task)
+        if time_range is not None:
+            if self._time_order is None:
+                self._time_order = numpy.argsort(self.table['pulse_time'], \
+                    kind='mergesort')
+            rows = numpy.intersect1d(rows, self._search(self._time_order, \
+                self.table['pulse_time'], time_range[0], time_range[1]))
+        if pulse_index is not None:
+            if self._pulse_index_order is None:
+                self._pulse_index_order = numpy.argsort( \
+                    self.table['pulse_index'], kind='mergesort')
+            if numpy.isscalar(pulse_index):
+                pulse_index = (pulse_index, pulse_index)
+            rows = numpy.intersect1d(rows, self._search( \
+                self._pulse_index_order, self.table['pulse_index'], \
+                pulse_index[0], pulse_index[1]))
+        return rows
+
+    @staticmethod
+    def _search(order, values, first, last):
+        """ Get the rows where first <= values <= last """
+        ordered = values[order]
+        start = numpy.searchsorted(ordered, first, side='left')
+        stop = numpy.searchsorted(ordered, last, side='right')
+        return order[start:stop]
+
+    def read_pulse(self, fid, row):
+        """ Decode the pulse in a row of the table from an open file """
+        fid.seek(int(self.table['header_offset'][row]))
+        pulse = DirsigBinPulse()
+        pulse.read(fid, self.header.file_format_version, \
+            self.header.endian(), self.header.x_pixel_count, \
+            self.header.y_pixel_count, is32bit=self.is32bit)
+        self.stats[row] = pulse.stats
+        return pulse
+
+    def read_pulses(self, rows):
+        """ Decode the pulses in the rows of the table """
+        output = []
+        fid = open(self.filename, 'rb')
+        try:
+            for row in rows:
+                output.append(self.read_pulse(fid, row))
+        finally:
+            fid.close()
+        return output
+
+    def compute_stats(self):
+        """ Decode every pulse that does not have statistics yet """
+        missing = numpy.flatnonzero(numpy.isnan(self.stats['active_max']))
+        if len(missing) > 0:
+            fid = open(self.filename, 'rb')
+            try:
+                for row in missing:
+                    self.read_pulse(fid, row)
+            finally:
+                fid.close()
+        return self.stats
+
+    def subset(self, rows):
+        """ Get an index that only contains some of the rows of the table """
+        output = DirsigBinIndex()
+        output.filename = self.filename
+        output.is32bit = self.is32bit
+        output.header = self.header
+        output.task_headers = self.task_headers
+        output.table = self.table[numpy.sort(rows)]
+        output.stats = self.stats[numpy.sort(rows)]
+        output.task_offsets = numpy.searchsorted(output.table['task'], \
+            numpy.arange(len(self.task_headers) + 1))
+        return output
+
+
+def _stack(arrays):
+    """ Stack arrays if they all have the same shape, or keep them as a list
+    """
+    if len(set(numpy.shape(array) for array in arrays)) > 1:
+        return list(arrays)
+    return numpy.array(arrays)
+
+
+class DirsigBinPulseBatch(object):
+    """ Pulses of one task, with their terms stacked where shapes allow
+
+    active is pulses x X x Y x bins (pulses x bins for single pixel arrays)
+    and passive is pulses x X x Y (pulses), unless the pulses have different
+    shapes (e.g. different time gate bin counts), when they are lists. When
+    they are stacked, the pulses of the batch are copies of the given pulses
+    whose terms are views of the stacked arrays, so the data is held once.
+    shape is the shape of the active term of a pulse, used when there are no
+    pulses.
+    """
+    def __init__(self, pulses, shape=(0,)):
+        pulses = list(pulses)
+        self.headers = [pulse.header for pulse in pulses]
+        if len(pulses) == 0:
+            self.pulses = []
+            self.active = numpy.empty((0,) + tuple(shape))
+            self.passive = numpy.empty((0,) + tuple(shape)[:-1])
+            return
+        self.active = _stack([pulse.active for pulse in pulses])
+        self.passive = _stack([pulse.passive for pulse in pulses])
+        if not self.is_stacked():
+            self.pulses = pulses
+            return
+        self.pulses = []
+        for number, pulse in enumerate(pulses):
+            pulse = DirsigBinPulse(pulse)
+            pulse.active = self.active[number]
+            pulse.passive = self.passive[number]
+            self.pulses.append(pulse)
+
+    def __len__(self):
+        return len(self.pulses)
+
+    def __getitem__(self, pulseindex):
+        return self.pulses[pulseindex]
+
+    def __iter__(self):
+        return iter(self.pulses)
+
+    def is_stacked(self):
+        """ Check if the terms of the pulses are stacked into arrays """
+        return isinstance(self.active, numpy.ndarray)
+
+    def pulse_time(self):
+        """ Get the time of each pulse """
+        return numpy.array([header.pulse_time for header in self.headers])
+
 
 class DirsigBin(object):
     """ A DIRSIG lidar bin file """
     def __init__(self, arg=None):
+        self.filename = None
+        self.from_stream = False
+        self.is32bit = False
+        self.index = None
+        self.spill = None
+        self._fid = None
         if arg == None:
             self.header = None
             self.tasks = []
@@ -649,25 +1160,95 @@ class DirsigBin(object):
             yield task
 
     def __getitem__(self, taskindex):
+        """ Get a task, or pulses of a task with binfile[task, pulses]
+
+        pulses can be a pulse number, or a slice or sequence of pulse numbers,
+        which gives a DirsigBinPulseBatch. Only the pulses that are asked for
+        are decoded if the file was opened with open (or scanned, see browse).
+        """
+        if isinstance(taskindex, tuple):
+            taskindex, pulses = taskindex
+            task = self.tasks[taskindex]
+            if isinstance(pulses, slice):
+                return DirsigBinPulseBatch((task[number] for number in \
+                    range(*pulses.indices(len(task)))), \
+                    shape=self._pulse_shape(taskindex))
+            elif hasattr(pulses, '__iter__'):
+                return DirsigBinPulseBatch((task[int(number)] for number in \
+                    pulses), shape=self._pulse_shape(taskindex))
+            return task[pulses]
         try:
             return self.tasks[taskindex]
         except Exception:
             raise
 
+    def _pulse_shape(self, taskindex):
+        """ Get the shape of the active term of the first pulse of a task,
+        without decoding it """
+        task = self.tasks[taskindex]
+        if len(task.pulses) > 0:
+            return numpy.shape(task.pulses[0].active)
+        frame = (self.header.x_pixel_count, self.header.y_pixel_count)
+        if frame == (1, 1):
+            # single pixel pulses have a 1D active term
+            frame = ()
+        bins = 0
+        if self.index is not None:
+            rows = self.index.task_rows(taskindex)
+            if len(rows) > 0:
+                bins = int(self.index.table['time_gate_bin_count'][rows[0]] * \
+                    self.index.table['samples_per_time_bin'][rows[0]])
+        return frame + (bins,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def ntasks(self):
         """ returns the number of tasks """
         return len(self.tasks)
 
     def clear(self):
         """ Clears a bin file """
+        self.close()
+        self.filename = None
+        # whether the bin was read from a stream, so there is no file to index
+        self.from_stream = False
+        self.is32bit = False
+        self.index = None
+        if self.spill is not None:
+            self.spill.close()
+        self.spill = None
         self.header = None
         self.tasks = []
         return self
 
-    def read(self, filename, is32bit=False):
-        """ Reads a bin file """
+    def read(self, filename, is32bit=False, sum_samples=False, rebin=1, \
+        max_memory=None):
+        """ Reads a bin file
+
+        filename can also be a file-like object (such as a decompressing
+        stream, see archive.py), which is only read forward and is not closed.
+        If sum_samples is True, the samples of each time bin are summed, and
+        every rebin time bins are summed into one, as each pulse is decoded
+        (see reduce_time_bins). If max_memory is given, the pulses decoded
+        after max_memory bytes of them are in memory are kept in a temporary
+        file as memory mapped arrays (see SpillStore).
+        """
         self.clear()
-        fid = open(filename, 'r')
+        is_stream = hasattr(filename, 'read')
+        if is_stream:
+            fid = filename
+            filename = str(getattr(fid, 'name', '<stream>'))
+        else:
+            fid = open(filename, 'rb')
+        self.filename = filename
+        self.from_stream = is_stream and not isinstance(fid, file)
+        self.is32bit = is32bit
+        if max_memory is not None:
+            self.spill = SpillStore(max_memory)
         try:
             byte = fid.read(11)
             if byte != "DIRSIGPROTO":
@@ -682,7 +1263,8 @@ class DirsigBin(object):
                 task = DirsigBinTask()
                 task.read(fid, self.header.file_format_version, \
                     self.header.endian(), self.header.x_pixel_count, \
-                    self.header.y_pixel_count, is32bit=is32bit)
+                    self.header.y_pixel_count, is32bit=is32bit, \
+                    sum_samples=sum_samples, rebin=rebin, spill=self.spill)
                 self.tasks.append(task)
 
             return self
@@ -690,7 +1272,109 @@ class DirsigBin(object):
         except RuntimeError, error:
             sys.stderr.write('ERROR: {0}s\n'.format(error))
         finally:
-            fid.close()
+            if not is_stream:
+                fid.close()
+
+    @classmethod
+    def open(cls, filename, is32bit=False):
+        """Opens a bin file, decoding its pulses when they are accessed.
+
+        The file is scanned (see scan) and kept open, and binfile[task][pulse]
+        and binfile[task, first:last:step] decode the pulses from it through
+        the index. The file is closed by close, or at the end of a with block:
+            with DirsigBin.open(filename) as binfile:
+                batch = binfile[0, 100:200]
+
+        The open file is not thread safe; see DirsigBinReader for that.
+
+        Args:
+            filename (str): The bin file.
+            is32bit (bool, optional): See read. The default is False.
+
+        Returns:
+            A DirsigBin.
+
+        """
+        output = cls().scan(filename, is32bit=is32bit)
+        output._fid = open(filename, 'rb')
+        for task_number, task in enumerate(output.tasks):
+            first = output.index.task_offsets[task_number]
+            task.loader = lambda pulse, first=first: \
+                output._load(first + pulse)
+        return output
+
+    def _load(self, row):
+        """ Decode the pulse in a row of the index from the open file """
+        if self._fid is None:
+            raise RuntimeError("'{0}' is not open.".format(self.filename))
+        return self.index.read_pulse(self._fid, row)
+
+    def close(self):
+        """ Close the file opened by open """
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
+
+    def scan(self, filename, is32bit=False):
+        """ Reads the headers of a bin file without decoding the pulses """
+        self.clear()
+        self.filename = filename
+        self.is32bit = is32bit
+        self.index = DirsigBinIndex().build(filename, is32bit=is32bit)
+        self.header = self.index.header
+        for task_header in self.index.task_headers:
+            task = DirsigBinTask()
+            task.header = task_header
+            self.tasks.append(task)
+        return self
+
+    def select(self, time_range=None, pulse_index=None, task=None):
+        """Decodes the pulses that match a query.
+
+        Only the matching pulses are decoded. The first query builds an index
+        of the pulse headers (see DirsigBinIndex), which is reused by later
+        queries. The bin must have been read from a file on disk (not from a
+        stream), as the index is built by reading the file again.
+
+        Args:
+            time_range (tuple, optional): The (first, last) pulse time to
+                select. Both ends are included. The default is None (any time).
+            pulse_index (int or tuple, optional): A pulse index, or the
+                (first, last) pulse indices to select. Both ends are included.
+                The default is None (any pulse index).
+            task (int, optional): The task to select. The default is None (all
+                tasks).
+
+        Returns:
+            A list of DirsigBinPulses in file order.
+
+        """
+        if self.index is None:
+            if self.from_stream or self.filename is None or \
+                not os.path.isfile(self.filename):
+                raise RuntimeError("'{0}' was not read from a file on disk, " \
+                    "so it cannot be indexed.".format(self.filename))
+            self.index = DirsigBinIndex().build(self.filename, \
+                is32bit=self.is32bit)
+        rows = self.index.find(time_range=time_range, \
+            pulse_index=pulse_index, task=task)
+
+        # pulses that have already been read do not need to be decoded again
+        output = []
+        missing = []
+        for row in rows:
+            task_number = self.index.table['task'][row]
+            pulse_number = self.index.table['pulse'][row]
+            if task_number < len(self.tasks) and \
+                len(self.tasks[task_number].pulses) == \
+                self.tasks[task_number].npulses():
+                output.append(self.tasks[task_number][pulse_number])
+            else:
+                output.append(None)
+                missing.append(row)
+        decoded = iter(self.index.read_pulses(missing))
+        return [pulse if pulse is not None else next(decoded) \
+            for pulse in output]
 
 if __name__ == "__main__":
     import os
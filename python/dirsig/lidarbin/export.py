@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""This module exports decoded bin files to chunked .npy shards.
+
+Description:
+    The pulses of one or more bin files are decoded one at a time and written
+    into shards of at most shard_pulses pulses. Each shard holds pulses of one
+    bin file that all have the same shape, in three .npy files:
+        - signal_<n>.npy: the signal (active + passive), pulses x X x Y x bins
+        - table_<n>.npy: the pulse header table rows (see DirsigBinIndex)
+        - range_<n>.npy: the range to each time bin, pulses x bins
+    manifest.json lists the bin files and the shards. The .npy files can be
+    memory mapped, so a training loader can read random pulses of random
+    shards without decoding or loading the whole data set.
+
+Usage:
+    To export a set of runs:
+        export_shards(filenames, 'shards', shard_pulses=1024)
+    To read random pulses:
+        shards = ShardedDataset('shards')
+        signal, row, ranges = shards[12345]
+
+External Dependancies:
+    json
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import json
+import os
+import numpy
+
+from dirsigbin import DirsigBinIndex, PULSE_TABLE_DTYPE
+
+MANIFEST = 'manifest.json'
+
+
+class _ShardWriter(object):
+    """ Collects the pulses of one shard and writes it """
+    def __init__(self, directory, number, file_number, shape, size, dtype):
+        self.directory = directory
+        self.number = number
+        self.file_number = file_number
+        self.signal = numpy.empty((size,) + shape, dtype=dtype)
+        self.table = numpy.empty(size, dtype=PULSE_TABLE_DTYPE)
+        self.ranges = numpy.empty((size, shape[-1]))
+        self.count = 0
+
+    def full(self):
+        return self.count == len(self.table)
+
+    def add(self, signal, row, ranges):
+        self.signal[self.count] = signal
+        self.table[self.count] = row
+        self.ranges[self.count] = ranges
+        self.count += 1
+
+    def write(self):
+        """ Save the shard, and get its manifest entry """
+        entry = {'file': self.file_number, 'count': self.count, \
+            'shape': list(self.signal.shape[1:])}
+        for name, values in (('signal', self.signal), ('table', self.table), \
+            ('range', self.ranges)):
+            entry[name] = '{0}_{1:05d}.npy'.format(name, self.number)
+            numpy.save(os.path.join(self.directory, entry[name]), \
+                values[:self.count])
+        return entry
+
+
+def export_shards(filenames, directory, shard_pulses=1024, dtype='f4', \
+    index_of_refraction=1.0, is32bit=False):
+    """Exports the pulses of bin files to .npy shards.
+
+    Args:
+        filenames (list): The bin files.
+        directory (str): The directory to write the shards and manifest to.
+            It is created if needed.
+        shard_pulses (int, optional): The largest number of pulses in a
+            shard. The default is 1024.
+        dtype (str, optional): The dtype of the signal shards. The default is
+            'f4'.
+        index_of_refraction (float, optional): The default is 1.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A dict containing the manifest.
+
+    """
+    if isinstance(filenames, basestring):
+        filenames = [filenames]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = {'files': [os.path.abspath(name) for name in filenames], \
+        'dtype': numpy.dtype(dtype).str, 'shards': []}
+    for file_number, filename in enumerate(filenames):
+        index = DirsigBinIndex().build(filename, is32bit=is32bit)
+        shape = (index.header.x_pixel_count, index.header.y_pixel_count)
+        shard = None
+        fid = open(filename, 'rb')
+        try:
+            for row in range(len(index)):
+                pulse = index.read_pulse(fid, row)
+                signal = numpy.reshape(pulse.get_signal(), shape + (-1,))
+                if shard is not None and (shard.full() or \
+                    shard.signal.shape[1:] != signal.shape):
+                    manifest['shards'].append(shard.write())
+                    shard = None
+                if shard is None:
+                    shard = _ShardWriter(directory, len(manifest['shards']), \
+                        file_number, signal.shape, min(shard_pulses, \
+                        len(index) - row), dtype)
+                shard.add(signal, index.table[row], pulse.time_to_range( \
+                    pulse.get_time(), index_of_refraction=index_of_refraction))
+        finally:
+            fid.close()
+        if shard is not None:
+            manifest['shards'].append(shard.write())
+    manifest['count'] = sum(entry['count'] for entry in manifest['shards'])
+    with open(os.path.join(directory, MANIFEST), 'w') as fid:
+        json.dump(manifest, fid, indent=1)
+    return manifest
+
+
+class ShardedDataset(object):
+    """ The pulses of a directory of .npy shards, memory mapped on demand """
+    def __init__(self, directory, mmap_mode='r'):
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(directory, MANIFEST), 'r') as fid:
+            self.manifest = json.load(fid)
+        self.offsets = numpy.concatenate(([0], numpy.cumsum( \
+            [entry['count'] for entry in self.manifest['shards']]))).astype( \
+            numpy.int64)
+        self._shards = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def shard(self, number):
+        """ Get the (signal, table, range) arrays of a shard """
+        if number not in self._shards:
+            entry = self.manifest['shards'][number]
+            self._shards[number] = tuple(numpy.load(os.path.join( \
+                self.directory, entry[name]), mmap_mode=self.mmap_mode) for \
+                name in ('signal', 'table', 'range'))
+        return self._shards[number]
+
+    def locate(self, pulse):
+        """ Get the (shard, position in the shard) of a pulse """
+        if pulse < 0:
+            pulse += len(self)
+        if not 0 <= pulse < len(self):
+            raise IndexError('pulse index out of range')
+        number = int(numpy.searchsorted(self.offsets, pulse, side='right')) - 1
+        return number, int(pulse - self.offsets[number])
+
+    def __getitem__(self, pulse):
+        """ Get the (signal, table row, ranges) of a pulse """
+        number, position = self.locate(pulse)
+        return tuple(values[position] for values in self.shard(number))
+
+    def shuffled(self, seed=None):
+        """ Get every pulse number in a random order """
+        return numpy.random.RandomState(seed).permutation(len(self))
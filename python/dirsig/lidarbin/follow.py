@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""This module reads the pulses of a bin file that is still being written.
+
+Description:
+    DIRSIG writes the bin file of a long simulation over hours. DirsigBinFollower
+    keeps its place in the file between polls. Each poll starts at the first
+    byte that has not been decoded, and decodes the pulses that are now
+    complete one at a time, so only one pulse is in memory even when the
+    follower is started on a large file. A pulse whose header has been
+    written, but whose pulse data bytes are not all there yet, is left for a
+    later poll.
+
+Usage:
+    To print the peak of every pulse as it is written:
+        for task, pulse, data in follow(filename, interval=5.0):
+            print task, pulse, data.statistics()['active_max']
+    Or to poll from an existing loop:
+        follower = DirsigBinFollower(filename)
+        pulses = follower.poll()
+    or, to handle each completed pulse before the next one is decoded:
+        for task, pulse, data in follower.completed():
+            ...
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import os
+import struct
+import time
+
+from dirsigbin import DirsigBinHeader, DirsigBinTaskHeader, \
+    DirsigBinPulseHeader, DirsigBinPulse
+
+
+class DirsigBinFollower(object):
+    """ Decodes the pulses of a growing bin file as they are completed """
+    def __init__(self, filename, is32bit=False):
+        self.filename = filename
+        self.is32bit = is32bit
+        self.header = None
+        self.task_headers = []
+        # the task and pulse of the next pulse to decode
+        self.task = 0
+        self.pulse = 0
+        # the file offset of the first byte that has not been decoded
+        self.position = 0
+
+    def done(self):
+        """ Check if every pulse of the file has been decoded """
+        return self.header is not None and self.task >= self.header.task_count
+
+    def poll(self):
+        """Decodes the pulses that have been completed since the last poll.
+
+        Returns:
+            A list of (task, pulse, DirsigBinPulse) tuples, which is empty if
+            no pulse has been completed.
+
+        """
+        return list(self.completed())
+
+    def completed(self):
+        """Decodes the completed pulses one at a time.
+
+        The file is read from the first byte that has not been decoded, and
+        only the pulse that is being yielded is held in memory, so a follower
+        can be started on a large file that is partly written. The place in
+        the file is kept after each pulse, so the iteration can be stopped
+        and started again.
+
+        Yields:
+            (task, pulse, DirsigBinPulse) tuples in file order.
+
+        """
+        fid = open(self.filename, 'rb')
+        try:
+            size = os.fstat(fid.fileno()).st_size
+            while not self.done():
+                fid.seek(self.position)
+                try:
+                    if self.header is None:
+                        magic = fid.read(11)
+                        if len(magic) < 11:
+                            break
+                        if magic != "DIRSIGPROTO":
+                            raise RuntimeError("'" + self.filename + \
+                                "' is not valid DIRSIG bin file.")
+                        self.header = DirsigBinHeader().read(fid)
+                    elif len(self.task_headers) == self.task:
+                        self.task_headers.append(DirsigBinTaskHeader().read( \
+                            fid, self.header.file_format_version, \
+                            self.header.endian()))
+                    elif self.pulse < self.task_headers[self.task].pulse_count:
+                        pulse = self._read_pulse(fid, size)
+                        if pulse is None:
+                            break
+                        self.position = fid.tell()
+                        self.pulse += 1
+                        yield self.task, self.pulse - 1, pulse
+                        continue
+                    else:
+                        self.task += 1
+                        self.pulse = 0
+                        continue
+                except struct.error:
+                    # the header has not been completely written yet
+                    break
+                self.position = fid.tell()
+        finally:
+            fid.close()
+
+    def _read_pulse(self, fid, size):
+        """ Decode the next pulse if all of its pulse data has been written """
+        start = fid.tell()
+        header = DirsigBinPulseHeader().read(fid, \
+            self.header.file_format_version, self.header.endian(), \
+            is32bit=self.is32bit)
+        if size - fid.tell() < header.pulse_data_bytes:
+            # wait for the rest of the pulse data
+            return None
+        fid.seek(start)
+        return DirsigBinPulse().read(fid, \
+            self.header.file_format_version, self.header.endian(), \
+            self.header.x_pixel_count, self.header.y_pixel_count, \
+            is32bit=self.is32bit)
+
+
+def follow(filename, interval=1.0, timeout=None, is32bit=False):
+    """Yields the pulses of a bin file as they are written.
+
+    Args:
+        filename (str): The bin file.
+        interval (float, optional): The number of seconds between polls. The
+            default is 1.0.
+        timeout (float, optional): Stop if no pulse has been completed for this
+            many seconds. The default is None (wait until every pulse of the
+            file has been read).
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Yields:
+        (task, pulse, DirsigBinPulse) tuples in file order.
+
+    """
+    follower = DirsigBinFollower(filename, is32bit=is32bit)
+    last = time.time()
+    while True:
+        found = False
+        for pulse in follower.completed():
+            found = True
+            yield pulse
+        if follower.done():
+            return
+        if found:
+            last = time.time()
+        elif timeout is not None and time.time() - last > timeout:
+            return
+        time.sleep(interval)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+"""This module groups the bin files of multi-array collections by array.
+
+Description:
+    A sensor with several focal plane arrays writes a bin file per array, and
+    version 2 file headers carry the focal plane array id. FpaCatalog reads
+    only the file header of each bin file and records its array id, array
+    size and task count, so the files of one array can be found without
+    opening any of the others. The catalog can be saved as JSON and loaded
+    again; files that changed since they were cataloged are read again by
+    update.
+
+    FpaDataset is the virtual data set of one array: its bin files, in
+    catalog order. It builds the index of a file (see DirsigBinIndex) the
+    first time the file is queried, and decodes only the pulses that match a
+    query. Files of version 0 or 1 have no array id, and are grouped under
+    UNKNOWN_FPA.
+
+Usage:
+    catalog = FpaCatalog().build(glob.glob('run/*.bin'))
+    catalog.save('run/fpa.json')
+    ...
+    catalog = FpaCatalog.load('run/fpa.json')
+    pulses = catalog.dataset(2).select(time_range=(10.0, 10.5))
+
+External Dependancies:
+    json
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import json
+import os
+import numpy
+
+from dirsigbin import DirsigBinHeader, DirsigBinIndex, PULSE_TABLE_DTYPE
+
+# the array id of files that do not store one (versions 0 and 1)
+UNKNOWN_FPA = -1
+
+
+def read_file_header(filename):
+    """ Read only the file header of a bin file """
+    fid = open(filename, 'rb')
+    try:
+        if fid.read(11) != "DIRSIGPROTO":
+            raise RuntimeError("'" + filename + \
+                "' is not valid DIRSIG bin file.")
+        return DirsigBinHeader().read(fid)
+    finally:
+        fid.close()
+
+
+class FpaCatalog(object):
+    """ The focal plane array of each of a set of bin files """
+    def __init__(self, is32bit=False):
+        self.is32bit = is32bit
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _entry(filename):
+        """ Make the catalog entry of a file """
+        header = read_file_header(filename)
+        status = os.stat(filename)
+        return {'filename': filename, \
+            'fpa': getattr(header, 'focal_plane_array_id', UNKNOWN_FPA), \
+            'version': header.file_format_version, \
+            'x_pixel_count': header.x_pixel_count, \
+            'y_pixel_count': header.y_pixel_count, \
+            'task_count': header.task_count, \
+            'size': status.st_size, 'mtime': status.st_mtime}
+
+    def build(self, filenames):
+        """ Catalog bin files by reading their file headers """
+        self.entries = [self._entry(filename) for filename in filenames]
+        return self
+
+    def update(self):
+        """ Catalog again the files that changed, and drop missing files
+
+        Returns the number of files that were read again.
+        """
+        entries = []
+        changed = 0
+        for entry in self.entries:
+            if not os.path.exists(entry['filename']):
+                continue
+            status = os.stat(entry['filename'])
+            if status.st_size != entry['size'] or \
+                status.st_mtime != entry['mtime']:
+                entry = self._entry(entry['filename'])
+                changed += 1
+            entries.append(entry)
+        self.entries = entries
+        return changed
+
+    def save(self, filename):
+        """ Save the catalog as JSON """
+        with open(filename, 'w') as fid:
+            json.dump({'is32bit': self.is32bit, 'entries': self.entries}, \
+                fid, indent=1)
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a catalog saved with save """
+        with open(filename, 'r') as fid:
+            contents = json.load(fid)
+        output = cls(is32bit=contents['is32bit'])
+        output.entries = [dict((str(key), value) for key, value in \
+            entry.items()) for entry in contents['entries']]
+        for entry in output.entries:
+            entry['filename'] = str(entry['filename'])
+        return output
+
+    def fpa_ids(self):
+        """ Get the sorted array ids in the catalog """
+        return sorted(set(entry['fpa'] for entry in self.entries))
+
+    def files(self, fpa):
+        """ Get the files of an array, in catalog order """
+        return [entry['filename'] for entry in self.entries if \
+            entry['fpa'] == fpa]
+
+    def groups(self):
+        """ Get a dict of the files of each array """
+        return dict((fpa, self.files(fpa)) for fpa in self.fpa_ids())
+
+    def dataset(self, fpa):
+        """ Get the virtual data set of an array """
+        return FpaDataset(fpa, self.files(fpa), is32bit=self.is32bit)
+
+
+class FpaDataset(object):
+    """ The pulses of the bin files of one focal plane array """
+    def __init__(self, fpa, filenames, is32bit=False):
+        self.fpa = fpa
+        self.filenames = list(filenames)
+        self.is32bit = is32bit
+        self._indices = {}
+
+    def __len__(self):
+        """ The number of pulses (builds the index of every file) """
+        return sum(len(self.index(number)) for number in \
+            range(len(self.filenames)))
+
+    def index(self, number):
+        """ Get the DirsigBinIndex of a file, building it the first time """
+        if number not in self._indices:
+            self._indices[number] = DirsigBinIndex().build( \
+                self.filenames[number], is32bit=self.is32bit)
+        return self._indices[number]
+
+    def find(self, time_range=None, pulse_index=None, task=None):
+        """Finds the pulses that match a query in every file of the array.
+
+        See DirsigBinIndex.find for the arguments.
+
+        Returns:
+            A list of (file number, rows) tuples for the files with matches.
+
+        """
+        output = []
+        for number in range(len(self.filenames)):
+            rows = self.index(number).find(time_range=time_range, \
+                pulse_index=pulse_index, task=task)
+            if len(rows) > 0:
+                output.append((number, rows))
+        return output
+
+    def select(self, time_range=None, pulse_index=None, task=None):
+        """ Decode the pulses that match a query (see find), in file order """
+        output = []
+        for number, rows in self.find(time_range=time_range, \
+            pulse_index=pulse_index, task=task):
+            output.extend(self.index(number).read_pulses(rows))
+        return output
+
+    def table(self):
+        """ Get the pulse header tables of every file, and the file of each row
+        """
+        tables = [self.index(number).table for number in \
+            range(len(self.filenames))]
+        if len(tables) == 0:
+            return numpy.empty(0, dtype=PULSE_TABLE_DTYPE), \
+                numpy.empty(0, dtype=int)
+        return numpy.concatenate(tables), numpy.repeat( \
+            numpy.arange(len(tables)), [len(table) for table in tables])
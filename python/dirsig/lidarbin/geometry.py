@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+"""This module provides the pointing geometry of the pulses in a bin file.
+
+Description:
+    The pulse headers of a bin file describe where the platform was and how
+    the transmitter and receiver were pointed. This module turns the pulse
+    header table of a DirsigBinIndex into rays in scene coordinates, and
+    intersects those rays with a flat ground plane.
+
+    The receiver looks down its -Z axis. Pixel directions are computed from
+    the pixel pitch, the array offset and the focal length of the task, which
+    are assumed to be in the same units. Pass focal_length explicitly if they
+    are not.
+
+Usage:
+    To get the ground footprint of every pulse:
+        index = dirsig.lidarbin.DirsigBinIndex().build(filename)
+        bounds = pulse_footprints(index)
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+
+def rotation_matrices(angles, order='xyz'):
+    """Makes rotation matrices from rotation angles.
+
+    Args:
+        angles (numpy.array): An n x 3 array of the x, y and z rotation angles
+            in radians.
+        order (str or sequence, optional): The order that the rotations are
+            applied in, or the order of each of the n rotations. The default
+            is 'xyz'.
+
+    Returns:
+        A numpy.array of size n x 3 x 3 containing the rotation matrices.
+
+    """
+    angles = numpy.reshape(angles, (-1, 3))
+    if not isinstance(order, basestring):
+        orders = numpy.asarray(order)
+        output = numpy.empty((angles.shape[0], 3, 3))
+        for value in numpy.unique(orders):
+            rows = orders == value
+            output[rows] = rotation_matrices(angles[rows], value)
+        return output
+    output = numpy.tile(numpy.eye(3), (angles.shape[0], 1, 1))
+    for axis in order.lower():
+        i = 'xyz'.index(axis)
+        j = (i + 1) % 3
+        k = (i + 2) % 3
+        cos = numpy.cos(angles[:, i])
+        sin = numpy.sin(angles[:, i])
+        rotation = numpy.zeros_like(output)
+        rotation[:, i, i] = 1.
+        rotation[:, j, j] = cos
+        rotation[:, k, k] = cos
+        rotation[:, k, j] = sin
+        rotation[:, j, k] = -sin
+        output = numpy.matmul(rotation, output)
+    return output
+
+
+def _affine(rotation=None, translation=None, count=1):
+    """ Makes n x 4 x 4 affines from rotations and translations """
+    output = numpy.tile(numpy.eye(4), (count, 1, 1))
+    if rotation is not None:
+        output[:, :3, :3] = rotation
+    if translation is not None:
+        output[:, :3, 3] = translation
+    return output
+
+
+def angle_orders(table, field, order='xyz'):
+    """Gets the rotation order of each pulse from a pulse header table.
+
+    Args:
+        table (numpy.array): Rows of a DirsigBinIndex pulse header table.
+        field (str): 'platform_orientation_angle_order' or
+            'receiver_orientation_angle_order'.
+        order (str, optional): The order of the rows that do not store a
+            valid one (version 2 bin files). The default is 'xyz'.
+
+    Returns:
+        A list of n rotation orders.
+
+    """
+    if field not in (table.dtype.names or ()):
+        return [order] * len(table)
+    output = []
+    for value in table[field]:
+        value = value.lower()
+        output.append(value if sorted(value) == ['x', 'y', 'z'] else order)
+    return output
+
+
+def receiver_to_scene(table, order='xyz'):
+    """Computes the receiver to scene affine of each pulse.
+
+    Version 2 bin files store the receiver to mount and mount to platform
+    affines. Older bin files store a pointing offset instead, and the
+    receiver is assumed to be aligned with its mount. Older bin files also
+    store the rotation order of the platform and mount pointing angles of
+    each pulse, which is used instead of order.
+
+    Args:
+        table (numpy.array): Rows of a DirsigBinIndex pulse header table.
+        order (str, optional): The rotation order of the platform and mount
+            pointing angles of pulses that do not store one (version 2 bin
+            files). The default is 'xyz'.
+
+    Returns:
+        A numpy.array of size n x 4 x 4 containing the affines.
+
+    """
+    count = len(table)
+    platform = _affine(rotation_matrices(table['platform_rotation'], \
+        angle_orders(table, 'platform_orientation_angle_order', order)), \
+        table['platform_location'], count)
+    pointing = _affine(rotation_matrices( \
+        table['receiver_mount_pointing_rotation'], angle_orders(table, \
+        'receiver_orientation_angle_order', order)), count=count)
+
+    mount_to_platform = table['receiver_mount_to_platform_affine']
+    receiver_to_mount = table['receiver_to_mount_affine']
+    missing = numpy.isnan(mount_to_platform[:, 0, 0])
+    if numpy.any(missing):
+        mount_to_platform = numpy.array(mount_to_platform)
+        receiver_to_mount = numpy.array(receiver_to_mount)
+        mount_to_platform[missing] = _affine(translation=table[missing][ \
+            'receiver_mount_pointing_offset'], count=numpy.sum(missing))
+        receiver_to_mount[missing] = numpy.eye(4)
+
+    return numpy.matmul(numpy.matmul(numpy.matmul(platform, \
+        mount_to_platform), pointing), receiver_to_mount)
+
+
+def pixel_directions(header, focal_length, corners=False):
+    """Computes the look direction of the pixels in the receiver frame.
+
+    Args:
+        header (DirsigBinHeader): The file header.
+        focal_length (float): The focal length of the receiver, in the units
+            of the pixel pitch.
+        corners (bool, optional): Set to True to get the directions of the
+            four corners of the array instead of the pixel centers. The default
+            is False.
+
+    Returns:
+        A numpy.array of size m x 3 containing unit vectors. The pixels are in
+        the same (x, y) order as the pulse data.
+
+    """
+    x_offset = getattr(header, 'x_array_offset', 0.)
+    y_offset = getattr(header, 'y_array_offset', 0.)
+    x_half = header.x_pixel_count / 2.
+    y_half = header.y_pixel_count / 2.
+    if corners:
+        x_pos = numpy.array([-x_half, x_half, x_half, -x_half])
+        y_pos = numpy.array([-y_half, -y_half, y_half, y_half])
+    else:
+        x_pos, y_pos = numpy.meshgrid( \
+            numpy.arange(header.x_pixel_count) + 0.5 - x_half, \
+            numpy.arange(header.y_pixel_count) + 0.5 - y_half, indexing='ij')
+    x_pos = x_pos.ravel() * header.x_pixel_pitch + x_offset
+    y_pos = y_pos.ravel() * header.y_pixel_pitch + y_offset
+    output = numpy.column_stack((x_pos, y_pos, \
+        -focal_length * numpy.ones_like(x_pos)))
+    return output / numpy.sqrt(numpy.sum(output ** 2, axis=1))[:, None]
+
+
+def pulse_rays(table, header, focal_length, corners=False, order='xyz'):
+    """Computes the rays of the pixels of each pulse in scene coordinates.
+
+    Args:
+        table (numpy.array): n rows of a DirsigBinIndex pulse header table.
+        header (DirsigBinHeader): The file header.
+        focal_length (float): The focal length of the receiver, in the units
+            of the pixel pitch.
+        corners (bool, optional): Set to True to use the four corners of the
+            array instead of the m pixel centers. The default is False.
+        order (str, optional): The rotation order of the pointing angles of
+            pulses that do not store one (see receiver_to_scene). The default
+            is 'xyz'.
+
+    Returns:
+        A tuple (origins, directions). origins is an n x 3 numpy.array with
+        the location of the receiver, and directions is an n x m x 3
+        numpy.array with the unit look direction of each pixel.
+
+    """
+    affines = receiver_to_scene(table, order=order)
+    directions = pixel_directions(header, focal_length, corners=corners)
+    return affines[:, :3, 3], numpy.einsum('nij,mj->nmi', \
+        affines[:, :3, :3], directions)
+
+
+def intersect_ground(origins, directions, height=0.):
+    """Intersects rays with a horizontal ground plane.
+
+    Args:
+        origins (numpy.array): An n x 3 array of ray origins.
+        directions (numpy.array): An n x m x 3 array of ray directions.
+        height (float, optional): The height of the ground plane. The default
+            is 0.
+
+    Returns:
+        A numpy.array of size n x m x 3 containing the intersections. Rays
+        that do not hit the ground are NaN.
+
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        distance = (height - origins[:, None, 2]) / directions[:, :, 2]
+    distance[~(distance > 0)] = numpy.nan
+    return origins[:, None, :] + distance[:, :, None] * directions
+
+
+def pulse_footprints(index, rows=None, focal_length=None, height=0., \
+    order='xyz'):
+    """Computes the ground bounding box illuminated by each pulse.
+
+    Args:
+        index (DirsigBinIndex): The index of the bin file.
+        rows (numpy.array, optional): The rows of the index to use. The
+            default is None (all pulses).
+        focal_length (float, optional): The focal length of the receiver, in
+            the units of the pixel pitch. The default is None (use the focal
+            length of the task header).
+        height (float, optional): The height of the ground plane. The default
+            is 0.
+        order (str, optional): The rotation order of the pointing angles of
+            pulses that do not store one (see receiver_to_scene). The default
+            is 'xyz'.
+
+    Returns:
+        A numpy.array of size n x 4 containing the (xmin, ymin, xmax, ymax) of
+        each pulse. Pulses that do not see the ground are NaN.
+
+    """
+    if rows is None:
+        rows = numpy.arange(len(index))
+    table = index.table[rows]
+    output = numpy.nan * numpy.ones((len(rows), 4))
+    for task in numpy.unique(table['task']):
+        in_task = table['task'] == task
+        if focal_length is None:
+            task_focal_length = index.task_headers[task].focal_length
+        else:
+            task_focal_length = focal_length
+        origins, directions = pulse_rays(table[in_task], index.header, \
+            task_focal_length, corners=True, order=order)
+        points = intersect_ground(origins, directions, height=height)
+        # a footprint is only bounded if every corner sees the ground
+        with numpy.errstate(invalid='ignore'):
+            output[in_task, 0:2] = numpy.min(points[:, :, 0:2], axis=1)
+            output[in_task, 2:4] = numpy.max(points[:, :, 0:2], axis=1)
+    return output
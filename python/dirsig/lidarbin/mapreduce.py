@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""This module provides a map-reduce over the pulses of bin files.
+
+Description:
+    The pulses of one or more bin files are split by byte offset into chunks,
+    and the chunks are processed by a pool of worker processes. Each worker
+    decodes only its own pulses, one at a time, maps each pulse to a value and
+    reduces the values into a partial aggregate. The partial aggregates are
+    then reduced in the calling process. Only one pulse per worker is ever
+    held in memory.
+
+    The map and reduce functions are sent to the worker processes, so they
+    must be defined at the top level of a module (or be a functools.partial
+    of such a function).
+
+Usage:
+    To get the total number of photons in a set of bin files:
+        total = reduce_pulses(filenames, total_photons, operator.add,
+            workers=8)
+    To get the mean waveform of a task:
+        waveform = reduce_pulses(filename, summed_waveform, operator.add)
+        waveform = waveform[:-1] / waveform[-1]
+
+External Dependancies:
+    multiprocessing
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import multiprocessing
+import numpy
+
+from dirsigbin import DirsigBinIndex
+
+
+def partition_pulses(index, parts):
+    """Splits the pulses of a bin file into contiguous chunks.
+
+    The chunks are balanced by the number of bytes of pulse data.
+
+    Args:
+        index (DirsigBinIndex): The index of the bin file.
+        parts (int): The number of chunks to make.
+
+    Returns:
+        A list of DirsigBinIndex, one for each non-empty chunk.
+
+    """
+    if len(index) == 0:
+        return []
+    ends = numpy.cumsum(index.table['pulse_data_bytes'], dtype=float)
+    splits = numpy.searchsorted(ends, ends[-1] * numpy.arange(1, parts) / \
+        float(parts))
+    output = []
+    for rows in numpy.split(numpy.arange(len(index)), splits):
+        if len(rows) > 0:
+            output.append(index.subset(rows))
+    return output
+
+
+def _reduce_chunk(args):
+    """ Map and reduce the pulses of a chunk (run in a worker process) """
+    index, map_fn, reduce_fn = args
+    has_value = False
+    output = None
+    fid = open(index.filename, 'rb')
+    try:
+        for row in range(len(index)):
+            value = map_fn(index.read_pulse(fid, row))
+            if has_value:
+                output = reduce_fn(output, value)
+            else:
+                output = value
+                has_value = True
+    finally:
+        fid.close()
+    return has_value, output
+
+
+def reduce_pulses(filenames, map_fn, reduce_fn, workers=2, initial=None, \
+    chunks_per_worker=4, is32bit=False):
+    """Maps and reduces every pulse of one or more bin files.
+
+    Args:
+        filenames (str or list): The bin file(s) to process.
+        map_fn (function): A function that takes a DirsigBinPulse and returns
+            a value.
+        reduce_fn (function): A function that combines two values into one.
+            It should be associative, since the pulses are reduced in chunks.
+        workers (int, optional): The number of worker processes. If 1, the
+            pulses are processed in this process. The default is 2.
+        initial (optional): A value to start the reduction with. The default
+            is None.
+        chunks_per_worker (int, optional): The number of chunks to split the
+            pulses into for each worker. The default is 4.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        The reduced value, or initial if there are no pulses.
+
+    """
+    if isinstance(filenames, basestring):
+        filenames = [filenames]
+
+    chunks = []
+    for filename in filenames:
+        index = DirsigBinIndex().build(filename, is32bit=is32bit)
+        chunks += partition_pulses(index, max(1, workers * chunks_per_worker))
+    jobs = [(chunk, map_fn, reduce_fn) for chunk in chunks]
+
+    if workers > 1:
+        pool = multiprocessing.Pool(processes=workers)
+        try:
+            partials = list(pool.imap(_reduce_chunk, jobs))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        partials = [_reduce_chunk(job) for job in jobs]
+
+    output = initial
+    has_value = initial is not None
+    for chunk_has_value, value in partials:
+        if not chunk_has_value:
+            continue
+        if has_value:
+            output = reduce_fn(output, value)
+        else:
+            output = value
+            has_value = True
+    return output
+
+
+def total_photons(pulse):
+    """ Map a pulse to the total number of photons in its signal """
+    return numpy.sum(pulse.get_signal())
+
+
+def peak_signal(pulse):
+    """ Map a pulse to the largest value of its signal """
+    return numpy.max(pulse.get_signal())
+
+
+def summed_waveform(pulse):
+    """Maps a pulse to the sum of its pixel waveforms.
+
+    Returns:
+        A numpy.array containing the summed signal of each time bin, followed
+        by the number of pixels. The mean waveform is output[:-1] / output[-1].
+        All of the pulses must have the same number of time bins.
+
+    """
+    signal = pulse.get_signal()
+    signal = numpy.reshape(signal, (-1, signal.shape[-1]))
+    return numpy.append(numpy.sum(signal, axis=0), signal.shape[0])
+
+
+def signal_histogram(pulse, edges):
+    """Maps a pulse to a histogram of its signal.
+
+    Use functools.partial(signal_histogram, edges=edges) as the map function.
+
+    Args:
+        pulse (DirsigBinPulse): The pulse.
+        edges (numpy.array): The edges of the histogram bins.
+
+    Returns:
+        A numpy.array containing the number of signal values in each bin.
+
+    """
+    return numpy.histogram(pulse.get_signal(), bins=edges)[0]
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+"""This module forms quick-look images from the pulses of a bin file.
+
+Description:
+    Each pulse gives a frame of X x Y values, either its passive term or the
+    sum of its active term over the time bins. The frames are placed in one
+    image that is allocated before any pulse is decoded (from the header scan
+    of DirsigBinIndex), then filled in one pass over the file:
+        - mosaic_by_index tiles the frames by pulse index, columns frames to a
+          row. A 1 x Y array on a pushbroom scan gives one image line per
+          pulse; a single pixel raster scan gives one pixel per pulse.
+        - mosaic_by_geometry projects every pixel onto a ground plane (see
+          geometry.py) and averages the values that fall in each grid cell.
+    Only one decoded pulse is held in memory at a time.
+
+Usage:
+    To make a passive image of a pushbroom collection:
+        image = mosaic_by_index(filename, mode='passive')
+    To make a ground image of the active returns with 1 m cells:
+        image = mosaic_by_geometry(filename, cell_size=1.0, mode='active')
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+from dirsigbin import DirsigBinIndex
+from geometry import intersect_ground, pulse_footprints, pulse_rays
+from raster import GridAccumulator
+
+
+def pulse_frame(pulse, mode='passive'):
+    """Gets the X x Y frame of a pulse.
+
+    Args:
+        pulse (DirsigBinPulse): The pulse.
+        mode (str, optional): 'passive' for the passive term, or 'active' for
+            the sum of the active term over the time bins. The default is
+            'passive'.
+
+    Returns:
+        A 2D numpy.array.
+
+    """
+    if mode == 'passive':
+        frame = numpy.asarray(pulse.passive)
+        return numpy.reshape(frame, frame.shape + (1, 1)[:2 - frame.ndim])
+    elif mode == 'active':
+        active = numpy.asarray(pulse.active)
+        return numpy.reshape(numpy.sum(active, axis=-1), \
+            (1, 1) if active.ndim == 1 else active.shape[:2])
+    raise ValueError("Unknown mosaic mode '{0}'".format(mode))
+
+
+def _rows(index, task):
+    """ Get the rows of the index of a task, or of every task """
+    if task is None:
+        return numpy.arange(len(index))
+    return index.task_rows(task)
+
+
+def mosaic_by_index(filename, mode='passive', columns=1, task=None, \
+    compact=False, is32bit=False):
+    """Tiles the frames of the pulses of a bin file by pulse index.
+
+    Args:
+        filename (str): The bin file.
+        mode (str, optional): See pulse_frame. The default is 'passive'.
+        columns (int, optional): The number of frames in each row of the
+            mosaic. The default is 1 (the frames are stacked along x).
+        task (int, optional): The task to use. The default is None (every
+            task).
+        compact (bool, optional): Number the tiles by the rank of the pulse
+            index among the pulse indices in the file, instead of by the
+            pulse index. The default is False.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A numpy.array of size (rows * X) x (columns * Y). The frame of the
+        pulse with index i (counted from the smallest pulse index) is in tile
+        (i // columns, i % columns). Tiles without a pulse are NaN, so there
+        is a tile for every pulse index from the smallest to the largest;
+        use compact for files with sparse or strided pulse indices (e.g. 0,
+        1000, 2000 would give 2001 tiles). Pulses of different tasks with the
+        same pulse index share a tile, and the last one in the file is kept.
+
+    """
+    index = DirsigBinIndex().build(filename, is32bit=is32bit)
+    rows = _rows(index, task)
+    frame_shape = (index.header.x_pixel_count, index.header.y_pixel_count)
+    if len(rows) == 0:
+        return numpy.empty((0, columns * frame_shape[1]))
+    tiles = index.table['pulse_index'][rows].astype(numpy.int64)
+    if compact:
+        tiles = numpy.unique(tiles, return_inverse=True)[1]
+    else:
+        tiles -= numpy.min(tiles)
+    tile_rows = int(numpy.max(tiles)) // columns + 1
+    output = numpy.full((tile_rows * frame_shape[0], \
+        columns * frame_shape[1]), numpy.nan)
+    fid = open(filename, 'rb')
+    try:
+        for row, tile in zip(rows, tiles):
+            x_start = (tile // columns) * frame_shape[0]
+            y_start = (tile % columns) * frame_shape[1]
+            output[x_start:x_start + frame_shape[0], \
+                y_start:y_start + frame_shape[1]] = pulse_frame( \
+                index.read_pulse(fid, row), mode=mode)
+    finally:
+        fid.close()
+    return output
+
+
+def mosaic_by_geometry(filename, cell_size, mode='passive', height=0., \
+    bounds=None, focal_length=None, task=None, order='xyz', is32bit=False):
+    """Projects the frames of the pulses of a bin file onto a ground grid.
+
+    Args:
+        filename (str): The bin file.
+        cell_size (float): The size of the grid cells in scene units.
+        mode (str, optional): See pulse_frame. The default is 'passive'.
+        height (float, optional): The height of the ground plane. The default
+            is 0.
+        bounds (tuple, optional): The (xmin, ymin, xmax, ymax) of the grid. The
+            default is None (the union of the pulse footprints).
+        focal_length (float, optional): See pulse_footprints. The default is
+            None (use the focal length of the task header).
+        task (int, optional): The task to use. The default is None (every
+            task).
+        order (str, optional): The rotation order of the pointing angles of
+            pulses that do not store one (see receiver_to_scene). The default
+            is 'xyz'.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A numpy.array containing the mean value of each cell (NaN if empty).
+        The first axis is x and the second is y (see GridAccumulator).
+
+    """
+    index = DirsigBinIndex().build(filename, is32bit=is32bit)
+    rows = _rows(index, task)
+    if bounds is None:
+        footprints = pulse_footprints(index, rows, focal_length=focal_length, \
+            height=height, order=order)
+        if not numpy.any(numpy.isfinite(footprints)):
+            raise RuntimeError('No pulse sees the ground; give the bounds.')
+        bounds = (numpy.nanmin(footprints[:, 0]), \
+            numpy.nanmin(footprints[:, 1]), numpy.nanmax(footprints[:, 2]), \
+            numpy.nanmax(footprints[:, 3]))
+    grid = GridAccumulator(bounds, cell_size)
+    fid = open(filename, 'rb')
+    try:
+        for row in rows:
+            table = index.table[row:row + 1]
+            if focal_length is None:
+                row_focal_length = \
+                    index.task_headers[table['task'][0]].focal_length
+            else:
+                row_focal_length = focal_length
+            origins, directions = pulse_rays(table, index.header, \
+                row_focal_length, order=order)
+            points = intersect_ground(origins, directions, height=height)[0]
+            values = numpy.ravel(pulse_frame(index.read_pulse(fid, row), \
+                mode=mode))
+            grid.add(points[:, 0], points[:, 1], values, values)
+    finally:
+        fid.close()
+    return grid.mean_intensity()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""This module provides photon noise realizations of bin file signals.
+
+Description:
+    The signal of a bin file is the mean number of photons that reach the
+    detector in each time bin. This module draws detections from those means
+    for batches of pulses at once, vectorized over (pulses, x, y, bins):
+        - 'poisson' draws the number of photons detected in each time bin.
+        - 'geiger' draws the time bin of the first detection of each pixel,
+          for a detector that can only fire once per range gate. Pixels that
+          do not fire are -1.
+
+    Every batch of pulses uses its own random stream, seeded by (seed, batch
+    number). A batch has the same realizations no matter which process draws
+    it, so batches can be split across worker processes and still be
+    reproducible.
+
+Usage:
+    To draw 1000 Poisson realizations of every pulse of a task:
+        binfile = dirsig.lidarbin.DirsigBin()
+        binfile.read(filename)
+        for batch, counts in realize_batches(binfile[0], count=1000, seed=42):
+            ...
+    To draw the batches of a worker, e.g., every 4th batch starting with the
+    2nd:
+        realize_batches(pulses, count=1000, seed=42, batches=range(1, n, 4))
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import itertools
+import numpy
+
+
+def stack_signals(pulses):
+    """Stacks the signals of pulses into one array.
+
+    Args:
+        pulses (list): DirsigBinPulses, or signal arrays such as those of
+            bintools.get_signal. They must all have the same shape.
+
+    Returns:
+        A numpy.array of size pulses x X x Y x bins containing the signal in
+        photons.
+
+    """
+    signals = []
+    for pulse in pulses:
+        if isinstance(pulse, numpy.ndarray):
+            signal = pulse
+        else:
+            signal = pulse.get_signal()
+        signals.append(numpy.reshape(signal, (1,) * (3 - signal.ndim) + \
+            signal.shape))
+    return numpy.array(signals)
+
+
+def batch_random_state(seed, batch):
+    """Makes the random stream of a batch.
+
+    Args:
+        seed (int): The seed of the whole simulation.
+        batch (int): The batch number.
+
+    Returns:
+        A numpy.random.RandomState.
+
+    """
+    return numpy.random.RandomState([seed, batch])
+
+
+def realize(signal, count=1, mode='poisson', random_state=None, \
+    efficiency=1., dark_counts=0.):
+    """Draws detections from a mean photon signal.
+
+    Args:
+        signal (numpy.array): The mean number of photons (..., bins).
+        count (int, optional): The number of realizations to draw. The
+            default is 1.
+        mode (str, optional): 'poisson' or 'geiger'. The default is
+            'poisson'.
+        random_state (numpy.random.RandomState, optional): The random stream.
+            The default is None (an unseeded stream).
+        efficiency (float, optional): The detection efficiency. The default is
+            1.
+        dark_counts (float, optional): The mean number of dark counts per
+            time bin. The default is 0.
+
+    Returns:
+        For 'poisson', a numpy.array of size count x signal.shape containing
+        the detected photons. For 'geiger', a numpy.array of size count x
+        signal.shape[:-1] containing the time bin of the first detection, or
+        -1.
+
+    """
+    if random_state is None:
+        random_state = numpy.random.RandomState()
+    mean = numpy.asarray(signal) * efficiency + dark_counts
+    size = (count,) + mean.shape
+
+    if mode == 'poisson':
+        return random_state.poisson(mean, size=size)
+    elif mode == 'geiger':
+        # probability of at least one photon in each time bin
+        fired = random_state.random_sample(size) < -numpy.expm1(-mean)
+        output = numpy.argmax(fired, axis=-1)
+        output[~numpy.any(fired, axis=-1)] = -1
+        return output
+    else:
+        raise ValueError("Unknown noise mode '{0}'".format(mode))
+
+
+def realize_batches(pulses, count=1, mode='poisson', seed=0, batch_size=64, \
+    batches=None, efficiency=1., dark_counts=0.):
+    """Draws detections for batches of pulses.
+
+    Args:
+        pulses (list): DirsigBinPulses or signal arrays (see stack_signals).
+        count (int, optional): The number of realizations of each pulse. The
+            default is 1.
+        mode (str, optional): 'poisson' or 'geiger'. The default is
+            'poisson'.
+        seed (int, optional): The seed of the whole simulation. The default is
+            0.
+        batch_size (int, optional): The number of pulses in a batch. The
+            default is 64.
+        batches (iterable, optional): The batch numbers to draw. The default
+            is None (all batches). If pulses can be sliced (a list, or a task
+            that is decoded on demand) only these batches are decoded;
+            otherwise pulses is read forward and they are drawn in order.
+        efficiency (float, optional): See realize.
+        dark_counts (float, optional): See realize.
+
+    Yields:
+        A tuple (batch, realizations). realizations is the output of realize
+        for the stacked signals of the batch, so its second axis is the pulse.
+
+    """
+    def draw(batch, chunk):
+        """ Draw the realizations of a batch """
+        return batch, realize(stack_signals(chunk), count=count, mode=mode, \
+            random_state=batch_random_state(seed, batch), \
+            efficiency=efficiency, dark_counts=dark_counts)
+
+    if batches is not None and hasattr(pulses, '__getitem__'):
+        for batch in batches:
+            yield draw(batch, pulses[batch * batch_size: \
+                (batch + 1) * batch_size])
+        return
+
+    # only one batch of pulses is decoded at a time
+    wanted = None if batches is None else set(batches)
+    iterator = iter(pulses)
+    batch = 0
+    while wanted is None or (wanted and batch <= max(wanted)):
+        chunk = list(itertools.islice(iterator, batch_size))
+        if len(chunk) == 0:
+            break
+        if wanted is None or batch in wanted:
+            yield draw(batch, chunk)
+        batch += 1
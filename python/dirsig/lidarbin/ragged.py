@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+"""This module packs pulses with different gate lengths into one array.
+
+Description:
+    When the time gate bin count or samples per time bin changes from pulse
+    to pulse, the pulses of a task can not be stacked into one numpy.array.
+    RaggedPulses stores the active terms of all of the pulses one after
+    another in one flat array, with the offset and shape of each pulse. The
+    operations work on the flat array at once instead of looping over pulses:
+        - pulse_sums: the sum of the active term of each pulse
+        - pixel_sums: the sum of the waveform of each pixel of each pulse
+        - peaks: the largest value and its time bin for each pixel
+        - peak_ranges: the range to the peak of each pixel
+        - signal: the signal (active + passive) as another RaggedPulses
+    The passive term of every pixel is stored the same way, in passive.
+
+Usage:
+    To pack the pulses of a task:
+        index = dirsig.lidarbin.DirsigBinIndex().build(filename)
+        pulses = read_ragged(index, index.task_rows(0))
+        ranges = pulses.peak_ranges()
+        active = pulses[10]
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+
+class RaggedPulses(object):
+    """ The active terms of pulses of different lengths in one flat array """
+    def __init__(self, shapes=None, time_gates=None):
+        if shapes is None:
+            shapes = numpy.empty((0, 3), dtype=numpy.int64)
+        self.shapes = numpy.asarray(shapes, dtype=numpy.int64)
+        sizes = numpy.prod(self.shapes, axis=1)
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(sizes))).astype( \
+            numpy.int64)
+        self.data = numpy.zeros(self.offsets[-1])
+        pixels = self.shapes[:, 0] * self.shapes[:, 1]
+        self.pixel_offsets = numpy.concatenate(([0], \
+            numpy.cumsum(pixels))).astype(numpy.int64)
+        # the passive term of every pixel of every pulse
+        self.passive = numpy.zeros(self.pixel_offsets[-1])
+        if time_gates is None:
+            time_gates = numpy.zeros((len(self.shapes), 2))
+        self.time_gates = numpy.asarray(time_gates, dtype=float)
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __getitem__(self, pulse):
+        """ Get a (x, y, bins) view of the active term of a pulse """
+        return self.data[self.offsets[pulse]:self.offsets[pulse + 1]].reshape( \
+            self.shapes[pulse])
+
+    def get_passive(self, pulse):
+        """ Get a (x, y) view of the passive term of a pulse """
+        return self.passive[self.pixel_offsets[pulse]: \
+            self.pixel_offsets[pulse + 1]].reshape(self.shapes[pulse][0:2])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.passive.nbytes + self.offsets.nbytes + \
+            self.pixel_offsets.nbytes + self.shapes.nbytes
+
+    def _pixel_offsets(self):
+        """ Get the start of each pixel waveform, and the pulse of each """
+        pixels = numpy.diff(self.pixel_offsets)
+        pulse = numpy.repeat(numpy.arange(len(self)), pixels)
+        within = numpy.arange(self.pixel_offsets[-1]) - \
+            numpy.repeat(self.pixel_offsets[:-1], pixels)
+        return self.offsets[pulse] + within * self.shapes[pulse, 2], pulse
+
+    @staticmethod
+    def _segment_sums(values, starts, lengths):
+        """ Sum the segments of a flat array (empty segments are 0) """
+        output = numpy.zeros(len(starts))
+        full = lengths > 0
+        if numpy.any(full):
+            output[full] = numpy.add.reduceat(values, starts[full])
+            # reduceat sums up to the next start, which includes any empty
+            # segments in between; they have no values, so this is exact
+        return output
+
+    def pulse_sums(self):
+        """ Get the sum of the active term of each pulse """
+        return self._segment_sums(self.data, self.offsets[:-1], \
+            numpy.diff(self.offsets))
+
+    def pixel_sums(self):
+        """ Get the sum of each pixel waveform, as a list of (x, y) arrays """
+        starts, pulse = self._pixel_offsets()
+        sums = self._segment_sums(self.data, starts, self.shapes[pulse, 2])
+        return self._split_pixels(sums)
+
+    def _split_pixels(self, values):
+        """ Split per pixel values into a list of (x, y) arrays """
+        return [value.reshape(shape[0:2]) for value, shape in zip( \
+            numpy.split(values, self.pixel_offsets[1:-1]), self.shapes)]
+
+    def peaks(self):
+        """Gets the peak of each pixel waveform.
+
+        Returns:
+            A tuple (values, bins) of lists of (x, y) arrays. Pixels without any
+            time bins have a value of NaN and a bin of -1.
+
+        """
+        values, bins = self._peaks()
+        return self._split_pixels(values), self._split_pixels(bins)
+
+    def _peaks(self):
+        """ Get the peak value and bin of every pixel, as flat arrays """
+        starts, pulse = self._pixel_offsets()
+        lengths = self.shapes[pulse, 2]
+        values = numpy.nan * numpy.ones(len(starts))
+        bins = -numpy.ones(len(starts), dtype=numpy.int64)
+        full = lengths > 0
+        if numpy.any(full):
+            starts = starts[full]
+            lengths = lengths[full]
+            values[full] = numpy.maximum.reduceat(self.data, starts)
+            # the first bin of each pixel that equals its maximum
+            position = numpy.arange(len(self.data)) - numpy.repeat(starts, \
+                lengths)
+            is_peak = self.data == numpy.repeat(values[full], lengths)
+            bins[full] = numpy.minimum.reduceat(numpy.where(is_peak, \
+                position, numpy.iinfo(numpy.int64).max), starts)
+        return values, bins
+
+    def peak_ranges(self, index_of_refraction=1.0):
+        """ Get the range in meters to the peak of each pixel """
+        peak_bin = self._peaks()[1]
+        pulse = self._pixel_offsets()[1]
+        start = self.time_gates[pulse, 0]
+        stop = self.time_gates[pulse, 1]
+        # the bins are spaced as in DirsigBinPulse.get_time
+        time = start + peak_bin * (stop - start) / \
+            numpy.maximum(self.shapes[pulse, 2] - 1, 1)
+        time[peak_bin < 0] = numpy.nan
+        return self._split_pixels(time * 299792458. / \
+            (2.0 * index_of_refraction))
+
+    def signal(self):
+        """ Get the signal (active + passive) of every pulse """
+        output = RaggedPulses(self.shapes, self.time_gates)
+        output.passive = self.passive
+        pulse = self._pixel_offsets()[1]
+        output.data = self.data + numpy.repeat(self.passive, \
+            self.shapes[pulse, 2])
+        return output
+
+
+def read_ragged(index, rows=None):
+    """Reads pulses of a bin file into a RaggedPulses.
+
+    The flat array is allocated once from the pulse header table, then each
+    pulse is decoded into it.
+
+    Args:
+        index (DirsigBinIndex): The index of the bin file.
+        rows (numpy.array, optional): The rows of the index to read. The
+            default is None (all pulses).
+
+    Returns:
+        A RaggedPulses.
+
+    """
+    if rows is None:
+        rows = numpy.arange(len(index))
+    table = index.table[rows]
+    shapes = numpy.column_stack(( \
+        index.header.x_pixel_count * numpy.ones(len(rows), dtype=numpy.int64), \
+        index.header.y_pixel_count * numpy.ones(len(rows), dtype=numpy.int64), \
+        table['time_gate_bin_count'].astype(numpy.int64) * \
+        table['samples_per_time_bin']))
+    output = RaggedPulses(shapes, numpy.column_stack(( \
+        table['time_gate_start'], table['time_gate_stop'])))
+    fid = open(index.filename, 'rb')
+    try:
+        for pulse, row in enumerate(rows):
+            decoded = index.read_pulse(fid, row)
+            output[pulse][:] = numpy.reshape(decoded.active, shapes[pulse])
+            output.get_passive(pulse)[:] = numpy.reshape(decoded.passive, \
+                shapes[pulse][0:2])
+    finally:
+        fid.close()
+    return output
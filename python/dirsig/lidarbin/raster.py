@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""This module rasterizes lidar returns into ground grids.
+
+Description:
+    The strongest return of each pixel of each pulse is placed in the scene by
+    following the pixel's look direction (see geometry.py) out to the range
+    of the peak of its waveform. The returns are accumulated into a regular
+    (x, y) grid with scatter operations (numpy.bincount and
+    numpy.maximum.at):
+        - the maximum height of each cell (a digital surface model)
+        - the sum of the intensities, and the mean intensity
+        - the number of returns
+    The pulses are decoded a chunk at a time, and each chunk of returns is
+    added to the grid and dropped, so the returns of a whole collection are
+    never in memory at once.
+
+Usage:
+    To make a DSM and an intensity image with 0.5 m cells:
+        grid = rasterize([filename], cell_size=0.5)
+        dsm = grid.dsm()
+        intensity = grid.mean_intensity()
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+from dirsigbin import DirsigBinIndex
+from geometry import pulse_rays, pulse_footprints
+
+
+class GridAccumulator(object):
+    """ A regular ground grid that returns are added to a chunk at a time """
+    def __init__(self, bounds, cell_size):
+        self.bounds = tuple(float(value) for value in bounds)
+        self.cell_size = float(cell_size)
+        self.shape = (int(numpy.ceil((bounds[2] - bounds[0]) / cell_size)), \
+            int(numpy.ceil((bounds[3] - bounds[1]) / cell_size)))
+        self.shape = (max(self.shape[0], 1), max(self.shape[1], 1))
+        self.max_height = -numpy.inf * numpy.ones(self.shape)
+        self.intensity_sum = numpy.zeros(self.shape)
+        self.count = numpy.zeros(self.shape, dtype=numpy.int64)
+
+    def cells(self, x, y):
+        """ Get the flat cell of each point, and which points are in the grid """
+        column = numpy.floor((numpy.asarray(x) - self.bounds[0]) / \
+            self.cell_size)
+        row = numpy.floor((numpy.asarray(y) - self.bounds[1]) / self.cell_size)
+        with numpy.errstate(invalid='ignore'):
+            inside = (column >= 0) & (column < self.shape[0]) & (row >= 0) & \
+                (row < self.shape[1])
+        return (column[inside] * self.shape[1] + row[inside]).astype( \
+            numpy.int64), inside
+
+    def add(self, x, y, z, intensity):
+        """ Add points (x, y, z) with intensities to the grid """
+        cells, inside = self.cells(x, y)
+        size = self.shape[0] * self.shape[1]
+        self.count += numpy.bincount(cells, minlength=size).reshape(self.shape)
+        self.intensity_sum += numpy.bincount(cells, weights=numpy.asarray( \
+            intensity)[inside], minlength=size).reshape(self.shape)
+        numpy.maximum.at(self.max_height.reshape(-1), cells, \
+            numpy.asarray(z)[inside])
+        return numpy.sum(inside)
+
+    def dsm(self):
+        """ Get the maximum height of each cell (NaN if it is empty) """
+        output = self.max_height.copy()
+        output[self.count == 0] = numpy.nan
+        return output
+
+    def mean_intensity(self):
+        """ Get the mean intensity of each cell (NaN if it is empty) """
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return self.intensity_sum / self.count
+
+    def cell_centers(self):
+        """ Get the x and y coordinates of the centers of the cells """
+        return self.bounds[0] + (numpy.arange(self.shape[0]) + 0.5) * \
+            self.cell_size, self.bounds[1] + \
+            (numpy.arange(self.shape[1]) + 0.5) * self.cell_size
+
+
+def extract_returns(index, rows, pulses, focal_length=None, threshold=0., \
+    order='xyz', index_of_refraction=1.0):
+    """Places the strongest return of each pixel of some pulses in the scene.
+
+    Args:
+        index (DirsigBinIndex): The index of the bin file.
+        rows (numpy.array): The rows of the index of the pulses.
+        pulses (list): The decoded DirsigBinPulses of the rows.
+        focal_length (float, optional): See pulse_footprints. The default is
+            None (use the focal length of the task header).
+        threshold (float, optional): Pixels whose peak is not above this are
+            skipped. The default is 0.
+        order (str, optional): The rotation order of the pointing angles of
+            pulses that do not store one (see receiver_to_scene). The default
+            is 'xyz'.
+        index_of_refraction (float, optional): The default is 1.
+
+    Returns:
+        A tuple (x, y, z, intensity) of numpy.arrays with one value per
+        return. The intensity is the peak value of the waveform.
+
+    """
+    rows = numpy.asarray(rows)
+    table = index.table[rows]
+    pixels = index.header.x_pixel_count * index.header.y_pixel_count
+    ranges = numpy.empty((len(rows), pixels))
+    peaks = numpy.empty((len(rows), pixels))
+    for number, pulse in enumerate(pulses):
+        active = numpy.reshape(pulse.active, (pixels, -1))
+        peak_bin = numpy.argmax(active, axis=1)
+        peaks[number] = active[numpy.arange(pixels), peak_bin]
+        ranges[number] = pulse.time_to_range(pulse.get_time()[peak_bin], \
+            index_of_refraction=index_of_refraction)
+
+    directions = numpy.empty((len(rows), pixels, 3))
+    origins = numpy.empty((len(rows), 3))
+    for task in numpy.unique(table['task']):
+        in_task = table['task'] == task
+        if focal_length is None:
+            task_focal_length = index.task_headers[task].focal_length
+        else:
+            task_focal_length = focal_length
+        origins[in_task], directions[in_task] = pulse_rays(table[in_task], \
+            index.header, task_focal_length, order=order)
+    points = origins[:, None, :] + ranges[:, :, None] * directions
+    keep = peaks > threshold
+    return points[keep][:, 0], points[keep][:, 1], points[keep][:, 2], \
+        peaks[keep]
+
+
+def rasterize(filenames, cell_size, bounds=None, chunk_pulses=256, \
+    focal_length=None, threshold=0., height=0., order='xyz', is32bit=False):
+    """Rasterizes the returns of bin files into a ground grid.
+
+    Args:
+        filenames (list): The bin files.
+        cell_size (float): The size of the grid cells in scene units.
+        bounds (tuple, optional): The (xmin, ymin, xmax, ymax) of the grid. The
+            default is None (the union of the pulse footprints on the ground
+            plane at height, computed from the pulse headers).
+        chunk_pulses (int, optional): The number of pulses to decode at a
+            time. The default is 256.
+        focal_length (float, optional): See pulse_footprints. The default is
+            None (use the focal length of the task header).
+        threshold (float, optional): See extract_returns. The default is 0.
+        height (float, optional): The ground height used for the default
+            bounds. The default is 0.
+        order (str, optional): The rotation order of the pointing angles of
+            pulses that do not store one (see receiver_to_scene). The default
+            is 'xyz'.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A GridAccumulator.
+
+    """
+    if isinstance(filenames, basestring):
+        filenames = [filenames]
+    indices = [DirsigBinIndex().build(filename, is32bit=is32bit) for \
+        filename in filenames]
+    if bounds is None:
+        footprints = numpy.concatenate([pulse_footprints(index, \
+            focal_length=focal_length, height=height, order=order) for \
+            index in indices])
+        if not numpy.any(numpy.isfinite(footprints)):
+            raise RuntimeError('No pulse sees the ground; give the bounds.')
+        bounds = (numpy.nanmin(footprints[:, 0]), \
+            numpy.nanmin(footprints[:, 1]), numpy.nanmax(footprints[:, 2]), \
+            numpy.nanmax(footprints[:, 3]))
+    grid = GridAccumulator(bounds, cell_size)
+    for index in indices:
+        fid = open(index.filename, 'rb')
+        try:
+            for first in range(0, len(index), chunk_pulses):
+                rows = numpy.arange(first, min(first + chunk_pulses, \
+                    len(index)))
+                pulses = [index.read_pulse(fid, row) for row in rows]
+                grid.add(*extract_returns(index, rows, pulses, \
+                    focal_length=focal_length, threshold=threshold, \
+                    order=order))
+        finally:
+            fid.close()
+    return grid
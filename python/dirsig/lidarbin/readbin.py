@@ -20,7 +20,7 @@ External Dependancies:
 	numpy
 	struct
 	sys
-	zlib
+	zlib (and the other codecs of bincodec.py)
 
 Warnings:
     This code has not been tested on a version 0 bin file.
@@ -50,14 +50,17 @@ __status__ = "Production"
 import sys     # stderr and command-line arguments
 import numpy   # base data type for signals
 import struct  # for convertint data types
-import zlib    # for decompression
+
+from bincodec import decode_payload, payload_values  # for decompression
 
 
 def readbin(filename, is32bit=False):
     """Reads a DIRSIG bin file.
 
     Args:
-        filename (str): A string containing the file to read.
+        filename (str): A string containing the file to read, or a file-like
+            object to read the bin file from. A file-like object is only read
+            forward, and is not closed.
         is32bit (bool, optional): Set to True if DIRSIG was compiled on a 32 bit
             system. This tells the code to use 32 bit long longs for the pulse
             data bytes field. In version 2 or later of the bin file, this was
@@ -187,18 +190,14 @@ def readbin(filename, is32bit=False):
         output['header'] = header
 
         # read the data
-        tmp = fid.read(header['pulse data bytes'])
-        if header['data compression type'] == 1:
-            tmp = zlib.decompress(tmp)
-
-        tmp = struct.unpack(xpixelct * ypixelct * header['samples per time bin'] * \
-            (header['time gate bin count'] + 1) * 'd', tmp)
+        tmp = decode_payload(fid.read(header['pulse data bytes']), \
+            header['data compression type'])
 
-        # pylint: disable=E1103
-        output['data'] = numpy.reshape(numpy.array(tmp), (xpixelct, \
-            ypixelct, header['samples per time bin'] * \
-            (header['time gate bin count'] + 1)))
-        # pylint: enable=E1103
+        # the passive term and then the samples of each time bin, in the byte
+        # order of the file
+        output['data'] = numpy.reshape(payload_values(tmp, endian), \
+            (xpixelct, ypixelct, header['samples per time bin'] * \
+            header['time gate bin count'] + 1))
 
         return output
 
@@ -244,7 +243,12 @@ def readbin(filename, is32bit=False):
 
 
     # start reading the bin file
-    fid = open(filename, "rb")
+    is_stream = hasattr(filename, 'read')
+    if is_stream:
+        fid = filename
+        filename = str(getattr(fid, 'name', '<stream>'))
+    else:
+        fid = open(filename, "rb")
     output = {}
     output['tasks'] = []
     header = {}
@@ -302,7 +306,8 @@ def readbin(filename, is32bit=False):
     except RuntimeError, error:
         sys.stderr.write('ERROR: #s\n' % str(error))
     finally:
-        fid.close()
+        if not is_stream:
+            fid.close()
 
     return output
 
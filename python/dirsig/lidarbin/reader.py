@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""This module provides thread safe random access to the pulses of a bin file.
+
+Description:
+    DirsigBin.read and DirsigBinIndex.read_pulse move the cursor of a file
+    object, so two threads can not read pulses from the same open file.
+    DirsigBinReader reads each pulse with a positional read (os.pread) at the
+    offset stored in the index, which does not use or move the cursor, so any
+    number of threads can read from one file descriptor at the same time. The
+    pulse is then decoded from the bytes in memory. The decompression releases
+    the GIL, so a pool of threads decodes pulses in parallel.
+
+    When os.pread is not available (Python 2, Windows), the seek and read of
+    each pulse are done under a lock. Only the reads are serialized; the
+    decoding is still done in parallel.
+
+    A PulseCache (see cache.py) can be put in front of the decoder, so pulses
+    that are read again are not decoded again. browse uses one to give a
+    DirsigBin whose tasks decode their pulses on demand.
+
+Usage:
+    with DirsigBinReader(filename) as reader:
+        pulse = reader.read_pulse(10)
+        pulses = reader.read_pulses(reader.index.task_rows(0), threads=8)
+    To scrub back and forth through the pulses of a large file:
+        binfile, reader = browse(filename, max_bytes=512 * 2 ** 20)
+        pulse = binfile[0][100]
+        print reader.cache.info()
+
+External Dependancies:
+    numpy
+    threading
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import os
+import threading
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+
+from cache import PulseCache
+from dirsigbin import DirsigBin, DirsigBinIndex, DirsigBinPulse
+
+_HAS_PREAD_ = hasattr(os, 'pread')
+
+
+class DirsigBinReader(object):
+    """ Reads the pulses of a bin file from any number of threads """
+    def __init__(self, filename=None, is32bit=False, index=None, cache=None):
+        self.index = None
+        self.cache = cache
+        self._fd = None
+        self._lock = threading.Lock()
+        if index is not None or filename is not None:
+            self.open(filename, is32bit=is32bit, index=index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self, filename=None, is32bit=False, index=None):
+        """ Open a bin file, building its index unless one is given """
+        self.close()
+        if index is None:
+            index = DirsigBinIndex().build(filename, is32bit=is32bit)
+        self.index = index
+        self._fd = os.open(index.filename, os.O_RDONLY | \
+            getattr(os, 'O_BINARY', 0))
+        return self
+
+    def close(self):
+        """ Close the file """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read_at(self, offset, size):
+        """ Read up to size bytes at an offset """
+        if _HAS_PREAD_:
+            return os.pread(self._fd, size, offset)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, size)
+
+    def pread(self, offset, size):
+        """ Read size bytes at an offset without moving the file cursor """
+        if self._fd is None:
+            raise RuntimeError('The reader is not open.')
+        data = self._read_at(offset, size)
+        # a single read can return fewer bytes than asked for
+        while len(data) < size:
+            more = self._read_at(offset + len(data), size - len(data))
+            if not more:
+                raise RuntimeError('The pulse data is shorter than expected.')
+            data += more
+        return data
+
+    def read_raw(self, row):
+        """ Get the bytes of the pulse header and pulse data of a row """
+        start = int(self.index.table['header_offset'][row])
+        stop = int(self.index.table['data_offset'][row] + \
+            self.index.table['pulse_data_bytes'][row])
+        return self.pread(start, stop - start)
+
+    def decode(self, data):
+        """ Decode a pulse from the bytes returned by read_raw """
+        header = self.index.header
+        return DirsigBinPulse().read(StringIO(data), \
+            header.file_format_version, header.endian(), \
+            header.x_pixel_count, header.y_pixel_count, \
+            is32bit=self.index.is32bit)
+
+    def read_pulse(self, row):
+        """ Decode the pulse in a row of the index (thread safe) """
+        if self.cache is not None:
+            return self.cache.fetch(row, lambda: self._read_pulse(row))
+        return self._read_pulse(row)
+
+    def _read_pulse(self, row):
+        """ Decode the pulse in a row of the index, bypassing the cache """
+        pulse = self.decode(self.read_raw(row))
+        self.index.stats[row] = pulse.stats
+        return pulse
+
+    def read_pulses(self, rows, threads=4):
+        """Decodes the pulses in rows of the index on a pool of threads.
+
+        Args:
+            rows (iterable): The rows of the index to decode.
+            threads (int, optional): The number of threads. If 1, the pulses
+                are decoded in this thread. The default is 4.
+
+        Returns:
+            A list of DirsigBinPulses in the order of rows.
+
+        """
+        rows = list(rows)
+        if threads <= 1 or len(rows) < 2:
+            return [self.read_pulse(row) for row in rows]
+        pool = ThreadPool(processes=min(threads, len(rows)))
+        try:
+            return pool.map(self.read_pulse, rows)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def browse(filename, max_bytes=256 * 2 ** 20, is32bit=False):
+    """Scans a bin file for browsing, decoding pulses when they are accessed.
+
+    Args:
+        filename (str): The bin file.
+        max_bytes (int, optional): The size of the pulse cache in bytes. The
+            default is 256 MB.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A tuple (DirsigBin, DirsigBinReader). binfile[task][pulse] decodes the
+        pulse through the cached reader, which should be closed when done.
+
+    """
+    binfile = DirsigBin().scan(filename, is32bit=is32bit)
+    reader = DirsigBinReader(index=binfile.index, \
+        cache=PulseCache(max_bytes=max_bytes))
+    for task_number, task in enumerate(binfile.tasks):
+        first = binfile.index.task_offsets[task_number]
+        task.loader = lambda pulse, first=first: reader.read_pulse(first + pulse)
+    return binfile, reader
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+"""This module publishes decoded bin files in shared memory.
+
+Description:
+    A bin file is decoded once into named shared memory blocks:
+        - <name>_meta: the file and task headers and the layout of the blocks
+        - <name>_table: the pulse header table (see DirsigBinIndex)
+        - <name>_passive: the passive term of every pulse (pulses, x, y)
+        - <name>_active: the active term of every pulse, one after another
+    Other processes attach to the blocks by name and get numpy views of them,
+    so the file is not decoded, or held in memory, once per process.
+
+    multiprocessing.shared_memory is used when it is available. Otherwise the
+    blocks are files in /dev/shm (or the temporary directory) that are memory
+    mapped.
+
+Usage:
+    In the process that decodes the file:
+        shared = publish(filename, 'run42')
+        ...
+        shared.close()
+        shared.unlink()
+    In the worker processes:
+        shared = attach('run42')
+        active = shared.active(row)
+        shared.close()
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import os
+import cPickle as pickle
+import tempfile
+import numpy
+
+try:
+    from multiprocessing import shared_memory
+    _HAS_SHARED_MEMORY_ = True
+except ImportError:
+    _HAS_SHARED_MEMORY_ = False
+
+from dirsigbin import DirsigBinIndex, PULSE_TABLE_DTYPE
+
+if os.path.isdir('/dev/shm'):
+    SHARED_DIR = '/dev/shm'
+else:
+    SHARED_DIR = tempfile.gettempdir()
+
+
+class _SharedBlock(object):
+    """ A named block of shared memory """
+    def __init__(self, name, size=None):
+        self.name = name
+        if _HAS_SHARED_MEMORY_:
+            if size is None:
+                self._block = shared_memory.SharedMemory(name=name)
+            else:
+                self._block = shared_memory.SharedMemory(name=name, \
+                    create=True, size=max(size, 1))
+            self.buffer = numpy.ndarray((self._block.size,), \
+                dtype=numpy.uint8, buffer=self._block.buf)
+        else:
+            path = os.path.join(SHARED_DIR, name)
+            if size is None:
+                self.buffer = numpy.memmap(path, dtype=numpy.uint8, mode='r+')
+            else:
+                if os.path.exists(path):
+                    raise RuntimeError("The shared block '" + name + \
+                        "' already exists.")
+                self.buffer = numpy.memmap(path, dtype=numpy.uint8, \
+                    mode='w+', shape=(max(size, 1),))
+
+    def view(self, dtype, shape):
+        """ Get a numpy view of the block """
+        dtype = numpy.dtype(dtype)
+        count = int(numpy.prod(shape))
+        return self.buffer[:count * dtype.itemsize].view(dtype).reshape(shape)
+
+    def close(self):
+        """ Detach from the block """
+        self.buffer = None
+        if _HAS_SHARED_MEMORY_:
+            self._block.close()
+
+    def unlink(self):
+        """ Free the block once every process has closed it """
+        if _HAS_SHARED_MEMORY_:
+            self._block.unlink()
+        else:
+            os.remove(os.path.join(SHARED_DIR, self.name))
+
+
+class SharedDirsigBin(object):
+    """ A bin file that has been decoded into shared memory """
+    def __init__(self):
+        self.name = None
+        self.header = None
+        self.task_headers = []
+        self.table = None
+        self.passive = None
+        self.active_offsets = None
+        self.task_offsets = None
+        self._blocks = []
+        self._active = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def active(self, row):
+        """ Get a view of the active term of the pulse in a row of the table """
+        shape = (self.header.x_pixel_count, self.header.y_pixel_count, \
+            self.table['time_gate_bin_count'][row] * \
+            self.table['samples_per_time_bin'][row])
+        return self._active[self.active_offsets[row]: \
+            self.active_offsets[row + 1]].reshape(shape)
+
+    def task_active(self, task):
+        """ Get a (pulses, x, y, bins) view of the active term of a task
+
+        This only works if every pulse of the task has the same number of time
+        bins.
+        """
+        start = self.task_offsets[task]
+        stop = self.task_offsets[task + 1]
+        bins = self.table['time_gate_bin_count'][start:stop] * \
+            self.table['samples_per_time_bin'][start:stop]
+        if len(bins) > 0 and numpy.any(bins != bins[0]):
+            raise RuntimeError('The pulses of task {0} do not have the same ' \
+                'number of time bins.'.format(task))
+        return self._active[self.active_offsets[start]: \
+            self.active_offsets[stop]].reshape((stop - start, \
+            self.header.x_pixel_count, self.header.y_pixel_count, -1))
+
+    def _layout(self):
+        """ Set the offsets of the active term of each pulse """
+        sizes = self.header.x_pixel_count * self.header.y_pixel_count * \
+            self.table['time_gate_bin_count'].astype(numpy.int64) * \
+            self.table['samples_per_time_bin']
+        self.active_offsets = numpy.concatenate(([0], numpy.cumsum(sizes)))
+        self.task_offsets = numpy.searchsorted(self.table['task'], \
+            numpy.arange(len(self.task_headers) + 1))
+
+    def close(self):
+        """ Detach from the shared memory """
+        self.table = None
+        self.passive = None
+        self._active = None
+        for block in self._blocks:
+            block.close()
+
+    def unlink(self):
+        """ Free the shared memory (call from the publishing process) """
+        for block in self._blocks:
+            block.unlink()
+        self._blocks = []
+
+
+def publish(filename, name, is32bit=False):
+    """Decodes a bin file into shared memory.
+
+    Args:
+        filename (str): The bin file to decode.
+        name (str): The name to publish the blocks under.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A SharedDirsigBin. The caller is responsible for unlinking it.
+
+    """
+    index = DirsigBinIndex().build(filename, is32bit=is32bit)
+    output = SharedDirsigBin()
+    output.name = name
+    output.header = index.header
+    output.task_headers = index.task_headers
+    output.table = index.table
+    output._layout()
+    pixels = (index.header.x_pixel_count, index.header.y_pixel_count)
+
+    try:
+        meta = pickle.dumps((output.header, output.task_headers, \
+            len(index)), 2)
+        block = _SharedBlock(name + '_meta', len(meta))
+        output._blocks.append(block)
+        block.buffer[:len(meta)] = numpy.frombuffer(meta, dtype=numpy.uint8)
+
+        block = _SharedBlock(name + '_table', index.table.nbytes)
+        output._blocks.append(block)
+        output.table = block.view(PULSE_TABLE_DTYPE, index.table.shape)
+        output.table[:] = index.table
+
+        block = _SharedBlock(name + '_passive', 8 * len(index) * \
+            pixels[0] * pixels[1])
+        output._blocks.append(block)
+        output.passive = block.view(float, (len(index),) + pixels)
+
+        block = _SharedBlock(name + '_active', 8 * output.active_offsets[-1])
+        output._blocks.append(block)
+        output._active = block.view(float, (output.active_offsets[-1],))
+
+        fid = open(filename, 'rb')
+        try:
+            for row in range(len(index)):
+                pulse = index.read_pulse(fid, row)
+                output.passive[row] = numpy.reshape(pulse.passive, pixels)
+                output.active(row)[:] = numpy.reshape(pulse.active, \
+                    output.active(row).shape)
+        finally:
+            fid.close()
+    except Exception:
+        output.close()
+        output.unlink()
+        raise
+    return output
+
+
+def attach(name):
+    """Attaches to a bin file published with publish.
+
+    Args:
+        name (str): The name the bin file was published under.
+
+    Returns:
+        A SharedDirsigBin whose arrays are views of the shared memory.
+
+    """
+    output = SharedDirsigBin()
+    output.name = name
+    block = _SharedBlock(name + '_meta')
+    output._blocks.append(block)
+    output.header, output.task_headers, count = \
+        pickle.loads(block.buffer.tobytes())
+    pixels = (output.header.x_pixel_count, output.header.y_pixel_count)
+
+    block = _SharedBlock(name + '_table')
+    output._blocks.append(block)
+    output.table = block.view(PULSE_TABLE_DTYPE, (count,))
+    output._layout()
+
+    block = _SharedBlock(name + '_passive')
+    output._blocks.append(block)
+    output.passive = block.view(float, (count,) + pixels)
+
+    block = _SharedBlock(name + '_active')
+    output._blocks.append(block)
+    output._active = block.view(float, (output.active_offsets[-1],))
+    return output
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""This module provides a sparse representation of pulse waveforms.
+
+Description:
+    Most of the time bins of an active waveform are zero outside of a few
+    bins around the returns. SparseDirsigBinPulse stores only the runs of
+    nonzero bins of each pixel, in a compressed sparse row layout:
+        - pixel_runs[i]:pixel_runs[i + 1] are the runs of pixel i, where the
+          pixels are in (x, y) order.
+        - run_starts[j] is the first time bin of run j, and
+          run_offsets[j]:run_offsets[j + 1] are its values in values.
+
+    The pulse data is decompressed and converted a block of pixels at a time,
+    so the dense (x, y, bins) array is never made.
+
+Usage:
+    To read the pulses of a task as sparse waveforms:
+        index = dirsig.lidarbin.DirsigBinIndex().build(filename)
+        pulses = read_sparse(index, index.task_rows(0))
+        ranges = pulses[0].peak_range()
+
+External Dependancies:
+    numpy
+    zlib
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+import zlib
+from cStringIO import StringIO
+
+from bincodec import decode_payload, COMPRESSION_NONE, COMPRESSION_ZLIB
+from dirsigbin import DirsigBinPulseHeader
+
+# the number of bytes of pulse data that are converted at a time
+BLOCK_BYTES = 1 << 20
+
+
+class SparseDirsigBinPulse(object):
+    """ A dirsig bin pulse that only stores the nonzero runs of each pixel """
+    def __init__(self):
+        self.header = None
+        self.shape = (0, 0, 0)
+        self.passive = numpy.empty((0, 0))
+        self.pixel_runs = numpy.zeros(1, dtype=numpy.int64)
+        self.run_starts = numpy.empty(0, dtype=numpy.int64)
+        self.run_offsets = numpy.zeros(1, dtype=numpy.int64)
+        self.values = numpy.empty(0)
+
+    def __repr__(self):
+        return "Sparse pulse with {0} nonzero values in {1} runs".format( \
+            len(self.values), len(self.run_starts))
+
+    @property
+    def nbytes(self):
+        """ The number of bytes used to store the pulse data """
+        return self.passive.nbytes + self.pixel_runs.nbytes + \
+            self.run_starts.nbytes + self.run_offsets.nbytes + self.values.nbytes
+
+    def num_time_bins(self):
+        """ Gets the number of time bins """
+        return self.shape[2]
+
+    def range_gate_width(self):
+        return self.header.time_gate_stop - self.header.time_gate_start
+
+    def get_time(self):
+        """ Get the time to the bins """
+        return numpy.linspace(self.header.time_gate_start, \
+            self.header.time_gate_stop, self.num_time_bins())
+
+    def read(self, fid, version, endian, xpixelct, ypixelct, is32bit=False):
+        """ reads a pulse """
+        self.__init__()
+        self.header = DirsigBinPulseHeader()
+        self.header.read(fid, version, endian, is32bit=is32bit)
+        active_bin_ct = self.header.samples_per_time_bin * \
+            self.header.time_gate_bin_count
+        self.shape = (xpixelct, ypixelct, active_bin_ct)
+
+        pixel_bytes = 8 * (active_bin_ct + 1)
+        block_pixels = max(1, BLOCK_BYTES // pixel_bytes)
+        compression = self.header.data_compression_type
+        remaining = self.header.pulse_data_bytes
+        stream = fid
+        if compression == COMPRESSION_ZLIB:
+            decompressor = zlib.decompressobj()
+            source = fid.read(self.header.pulse_data_bytes)
+        elif compression != COMPRESSION_NONE:
+            # other codecs and filters can not be decoded a block at a time
+            stream = StringIO(decode_payload(fid.read(remaining), \
+                compression))
+            remaining = len(stream.getvalue())
+
+        passive = []
+        run_counts = []
+        run_starts = []
+        run_lengths = []
+        values = []
+        pending = ''
+        for first in range(0, xpixelct * ypixelct, block_pixels):
+            pixels = min(block_pixels, xpixelct * ypixelct - first)
+            wanted = pixels * pixel_bytes - len(pending)
+            if compression == COMPRESSION_ZLIB:
+                pending += decompressor.decompress(source, wanted)
+                source = decompressor.unconsumed_tail
+            else:
+                pending += stream.read(min(wanted, remaining))
+                remaining -= min(wanted, remaining)
+            if len(pending) < pixels * pixel_bytes:
+                raise RuntimeError('The pulse data is shorter than expected.')
+            # the values are byteswapped (if needed) once they are gathered
+            block = numpy.frombuffer(pending[:pixels * pixel_bytes], \
+                dtype=endian + 'f8').reshape((pixels, active_bin_ct + 1))
+            pending = pending[pixels * pixel_bytes:]
+
+            passive.append(block[:, 0])
+            nonzero = block[:, 1:] != 0
+            # runs begin where the nonzero mask steps up and end where it
+            # steps down
+            steps = numpy.diff(numpy.pad(nonzero.astype(numpy.int8), \
+                ((0, 0), (1, 1)), 'constant'), axis=1)
+            start_pixel, start_bin = numpy.nonzero(steps == 1)
+            stop_bin = numpy.nonzero(steps == -1)[1]
+            run_counts.append(numpy.bincount(start_pixel, minlength=pixels))
+            run_starts.append(start_bin)
+            run_lengths.append(stop_bin - start_bin)
+            values.append(block[:, 1:][nonzero])
+
+        self.passive = numpy.reshape(numpy.concatenate(passive), \
+            (xpixelct, ypixelct)) * self.range_gate_width()
+        self.pixel_runs = numpy.concatenate(([0], \
+            numpy.cumsum(numpy.concatenate(run_counts)))).astype(numpy.int64)
+        self.run_starts = numpy.concatenate(run_starts).astype(numpy.int64)
+        self.run_offsets = numpy.concatenate(([0], numpy.cumsum( \
+            numpy.concatenate(run_lengths)))).astype(numpy.int64)
+        self.values = numpy.concatenate(values).astype(float)
+        return self
+
+    def _value_pixels(self):
+        """ Get the pixel of each value """
+        runs_per_pixel = numpy.diff(self.pixel_runs)
+        run_pixels = numpy.repeat(numpy.arange(len(runs_per_pixel)), \
+            runs_per_pixel)
+        return numpy.repeat(run_pixels, numpy.diff(self.run_offsets))
+
+    def _value_bins(self):
+        """ Get the time bin of each value """
+        lengths = numpy.diff(self.run_offsets)
+        return numpy.repeat(self.run_starts - self.run_offsets[:-1], \
+            lengths) + numpy.arange(len(self.values))
+
+    def to_dense(self):
+        """ Get the active term as a dense (x, y, bins) array """
+        output = numpy.zeros(self.shape)
+        output.reshape((-1, self.shape[2]))[self._value_pixels(), \
+            self._value_bins()] = self.values
+        return output
+
+    def get_signal(self, x=None, y=None):
+        """Gets the signal of a pixel, or of the whole pulse.
+
+        Args:
+            x (int, optional): The x pixel. The default is None (all pixels).
+            y (int, optional): The y pixel. The default is None (all pixels).
+
+        Returns:
+            A numpy.array containing the signal, (bins) for a pixel or (x, y,
+            bins) for the pulse.
+
+        """
+        if x is None or y is None:
+            return self.to_dense() + self.passive[:, :, None]
+        pixel = x * self.shape[1] + y
+        output = self.passive[x, y] * numpy.ones(self.shape[2])
+        for run in range(self.pixel_runs[pixel], self.pixel_runs[pixel + 1]):
+            start = self.run_starts[run]
+            length = self.run_offsets[run + 1] - self.run_offsets[run]
+            output[start:start + length] += \
+                self.values[self.run_offsets[run]:self.run_offsets[run + 1]]
+        return output
+
+    def sum(self):
+        """ Get the sum of the active term of each pixel (x, y) """
+        return numpy.bincount(self._value_pixels(), weights=self.values, \
+            minlength=self.shape[0] * self.shape[1]).reshape(self.shape[0:2])
+
+    def signal_sum(self):
+        """ Get the sum of the signal of each pixel (x, y) """
+        return self.sum() + self.passive * self.shape[2]
+
+    def peak(self):
+        """Gets the peak of the active term of each pixel.
+
+        Returns:
+            A tuple (value, bin) of (x, y) numpy.arrays. Pixels without any
+            nonzero bins have a value of 0 and a bin of -1.
+
+        """
+        pixels = self._value_pixels()
+        bins = self._value_bins()
+        value = numpy.zeros(self.shape[0] * self.shape[1])
+        peak_bin = -numpy.ones(self.shape[0] * self.shape[1], dtype=int)
+        if len(self.values) > 0:
+            # sort by pixel, then by decreasing value
+            order = numpy.lexsort((-self.values, pixels))
+            first = numpy.concatenate(([True], \
+                pixels[order][1:] != pixels[order][:-1]))
+            value[pixels[order][first]] = self.values[order][first]
+            peak_bin[pixels[order][first]] = bins[order][first]
+        return value.reshape(self.shape[0:2]), \
+            peak_bin.reshape(self.shape[0:2])
+
+    def peak_range(self, index_of_refraction=1.0):
+        """ Get the range in meters to the peak of each pixel (NaN if empty) """
+        peak_bin = self.peak()[1]
+        time = self.get_time()
+        output = numpy.nan * numpy.ones(peak_bin.shape)
+        output[peak_bin >= 0] = time[peak_bin[peak_bin >= 0]]
+        return output * 299792458. / (2.0 * index_of_refraction)
+
+
+def read_sparse(index, rows=None):
+    """Reads pulses of a bin file as sparse waveforms.
+
+    Args:
+        index (DirsigBinIndex): The index of the bin file.
+        rows (numpy.array, optional): The rows of the index to read. The
+            default is None (all pulses).
+
+    Returns:
+        A list of SparseDirsigBinPulse.
+
+    """
+    if rows is None:
+        rows = range(len(index))
+    output = []
+    fid = open(index.filename, 'rb')
+    try:
+        for row in rows:
+            fid.seek(int(index.table['header_offset'][row]))
+            output.append(SparseDirsigBinPulse().read(fid, \
+                index.header.file_format_version, index.header.endian(), \
+                index.header.x_pixel_count, index.header.y_pixel_count, \
+                is32bit=index.is32bit))
+    finally:
+        fid.close()
+    return output
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""This module provides a spatial index of the pulses in a bin file.
+
+Description:
+    The ground footprint of every pulse is computed from the pulse headers
+    (see geometry.py) and stored in a regular grid. The grid answers "which
+    pulses illuminate this bounding box" without decoding any pulse data. The
+    matching pulses can then be decoded one at a time.
+
+Usage:
+    To find the pulses that illuminate a region of the scene:
+        spatial = DirsigBinSpatialIndex().build(filename)
+        rows = spatial.query((xmin, ymin, xmax, ymax))
+        for pulse in spatial.pulses((xmin, ymin, xmax, ymax)):
+            ...
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+from dirsigbin import DirsigBinIndex
+from geometry import pulse_footprints
+
+
+class DirsigBinSpatialIndex(object):
+    """ A grid of the ground footprints of the pulses of a bin file """
+    def __init__(self):
+        self.index = None
+        self.bounds = numpy.empty((0, 4))
+        self.origin = numpy.zeros(2)
+        self.cell_size = 1.
+        self.grid_shape = (0, 0)
+        self.cells = numpy.empty(0, dtype=numpy.int64)
+        self.cell_rows = numpy.empty(0, dtype=int)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def build(self, index, cell_size=None, focal_length=None, height=0., \
+        order='xyz', is32bit=False):
+        """Builds the spatial index.
+
+        Args:
+            index (DirsigBinIndex or str): The index of the bin file, or the
+                name of the bin file to index.
+            cell_size (float, optional): The size of a grid cell in scene
+                units. The default is None (the median footprint size).
+            focal_length (float, optional): See geometry.pulse_footprints.
+            height (float, optional): The height of the ground plane. The
+                default is 0.
+            order (str, optional): The rotation order of the pointing angles
+                of pulses that do not store one (see receiver_to_scene). The
+                default is 'xyz'.
+            is32bit (bool, optional): Passed to DirsigBinIndex.build when a
+                file name is given. The default is False.
+
+        Returns:
+            self
+
+        """
+        if not isinstance(index, DirsigBinIndex):
+            index = DirsigBinIndex().build(index, is32bit=is32bit)
+        self.__init__()
+        self.index = index
+        self.bounds = pulse_footprints(index, focal_length=focal_length, \
+            height=height, order=order)
+
+        valid = numpy.flatnonzero(numpy.all(numpy.isfinite(self.bounds), \
+            axis=1))
+        if len(valid) == 0:
+            return self
+        bounds = self.bounds[valid]
+
+        if cell_size is None:
+            cell_size = numpy.median(numpy.maximum(bounds[:, 2] - \
+                bounds[:, 0], bounds[:, 3] - bounds[:, 1]))
+            if not cell_size > 0:
+                cell_size = 1.
+        self.cell_size = float(cell_size)
+        self.origin = numpy.min(bounds[:, 0:2], axis=0)
+        first, last = self._cells(bounds)
+        self.grid_shape = tuple(numpy.max(last, axis=0) + 1)
+
+        # list every (cell, pulse) pair, then sort by cell. Only the occupied
+        # cells are stored.
+        counts = numpy.prod(last - first + 1, axis=1)
+        pulse = numpy.repeat(numpy.arange(len(valid)), counts)
+        within = numpy.arange(len(pulse)) - numpy.repeat(numpy.cumsum( \
+            counts) - counts, counts)
+        width = (last - first + 1)[pulse, 0]
+        cell_x = first[pulse, 0] + within % width
+        cell_y = first[pulse, 1] + within // width
+        cells = cell_x.astype(numpy.int64) * self.grid_shape[1] + cell_y
+        by_cell = numpy.argsort(cells, kind='mergesort')
+        self.cells = cells[by_cell]
+        self.cell_rows = valid[pulse[by_cell]]
+        return self
+
+    def _cells(self, bounds):
+        """ Get the first and last grid cells covered by bounding boxes """
+        first = numpy.floor((bounds[:, 0:2] - self.origin) / \
+            self.cell_size).astype(int)
+        last = numpy.floor((bounds[:, 2:4] - self.origin) / \
+            self.cell_size).astype(int)
+        return first, last
+
+    def query(self, bbox):
+        """Finds the pulses whose footprint overlaps a bounding box.
+
+        Args:
+            bbox (tuple): The (xmin, ymin, xmax, ymax) of the region.
+
+        Returns:
+            A numpy.array containing the rows of the pulse index in file order.
+            The pulse offsets are self.index.table['header_offset'][rows].
+
+        """
+        if len(self.cell_rows) == 0:
+            return numpy.empty(0, dtype=int)
+        first, last = self._cells(numpy.reshape(numpy.asarray(bbox, \
+            dtype=float), (1, 4)))
+        first = numpy.maximum(first[0], 0)
+        last = numpy.minimum(last[0], numpy.array(self.grid_shape) - 1)
+        if numpy.any(last < first):
+            return numpy.empty(0, dtype=int)
+
+        candidates = []
+        for cell_x in range(first[0], last[0] + 1):
+            # the cells of a grid column are contiguous in the sorted cells
+            start, stop = numpy.searchsorted(self.cells, [cell_x * \
+                self.grid_shape[1] + first[1], cell_x * self.grid_shape[1] + \
+                last[1] + 1])
+            candidates.append(self.cell_rows[start:stop])
+        rows = numpy.unique(numpy.concatenate(candidates))
+
+        # the cells are coarser than the footprints
+        bounds = self.bounds[rows]
+        overlap = (bounds[:, 0] <= bbox[2]) & (bounds[:, 2] >= bbox[0]) & \
+            (bounds[:, 1] <= bbox[3]) & (bounds[:, 3] >= bbox[1])
+        return rows[overlap]
+
+    def pulses(self, bbox):
+        """ Decode the pulses whose footprint overlaps a bounding box """
+        rows = self.query(bbox)
+        fid = open(self.index.filename, 'rb')
+        try:
+            for row in rows:
+                yield self.index.read_pulse(fid, row)
+        finally:
+            fid.close()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""This module keeps decoded pulses within a memory budget.
+
+Description:
+    SpillStore counts the bytes of the pulses that are decoded. While they fit
+    in max_memory the pulses are kept in memory as they are; after that their
+    active and passive terms are copied into a temporary file and replaced by
+    numpy.memmap views of it, so pulse.active is still a numpy.array and
+    the rest of the code does not need to know where it lives. The file is
+    grown in segments of segment_bytes, each mapped once, so there is not a
+    mapping per pulse. It is created with tempfile.TemporaryFile, and so has
+    no name and is removed once the store and every view of it are gone.
+
+Usage:
+    binfile = DirsigBin().read(filename, max_memory=2 ** 30)
+
+External Dependancies:
+    numpy
+    tempfile
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import tempfile
+import numpy
+
+# the default size of the memory mapped segments of the temporary file
+SEGMENT_BYTES = 64 * 2 ** 20
+
+# the alignment of the arrays in a segment
+_ALIGNMENT = 16
+
+
+class SpillStore(object):
+    """ Keeps pulses in memory up to a budget, and in a temporary file after """
+    def __init__(self, max_memory, directory=None, \
+        segment_bytes=SEGMENT_BYTES):
+        if max_memory < 0:
+            raise ValueError('max_memory must not be negative.')
+        self.max_memory = max_memory
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.spilled_pulses = 0
+        self._fid = None
+        self._file_bytes = 0
+        self._segment = None
+        self._position = 0
+
+    def _allocate(self, nbytes):
+        """ Get nbytes of a memory mapped segment """
+        if self._segment is None or \
+            self._position + nbytes > len(self._segment):
+            if self._fid is None:
+                self._fid = tempfile.TemporaryFile(dir=self.directory)
+            size = max(nbytes, self.segment_bytes)
+            self._segment = numpy.memmap(self._fid, dtype=numpy.uint8, \
+                mode='r+', offset=self._file_bytes, shape=(size,))
+            self._file_bytes += size
+            self._position = 0
+        output = self._segment[self._position:self._position + nbytes]
+        self._position += -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+        return output
+
+    def store(self, array):
+        """ Copy an array to the temporary file, and get the view of it """
+        array = numpy.asarray(array)
+        output = self._allocate(max(array.nbytes, 1))[:array.nbytes].view( \
+            array.dtype).reshape(array.shape)
+        output[...] = array
+        self.spilled_bytes += array.nbytes
+        return output
+
+    def place(self, pulse):
+        """ Keep a pulse in memory if it fits in the budget, or spill it """
+        nbytes = numpy.asarray(pulse.active).nbytes + \
+            numpy.asarray(pulse.passive).nbytes
+        if self.memory_bytes + nbytes <= self.max_memory:
+            self.memory_bytes += nbytes
+            return pulse
+        pulse.active = self.store(pulse.active)
+        pulse.passive = self.store(pulse.passive)
+        self.spilled_pulses += 1
+        return pulse
+
+    def close(self):
+        """ Close the temporary file (views that are still held stay valid) """
+        self._segment = None
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
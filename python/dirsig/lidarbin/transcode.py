@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+"""This module re-encodes the pulse data of a bin file.
+
+Description:
+    The file, task and pulse headers are copied as they are, except for the
+    data compression type and pulse data bytes of each pulse. The pulse data
+    is decoded and encoded again with another codec and pre-filters (see
+    bincodec.py). The encoding is done by a pool of worker processes, a window
+    of pulses at a time, so only a few pulses are held in memory.
+
+    The readers of this package can read the transcoded file. DIRSIG itself
+    can only read files that use the 'none' or 'zlib' codecs without filters.
+
+USAGE:
+    python transcode.py [options] infile outfile
+
+    [options] are:
+    --codec=<codec>             The codec: none, zlib, bz2 or lzma. The default
+                                  is zlib.
+    --level=<level>             The compression level. The default is 9.
+    --shuffle                   Byte shuffle the doubles before compressing.
+    --delta                     Delta encode the doubles before compressing.
+    --processes=<number>        The number of processes to run simultaneously.
+                                  The default is 2.
+    --32bit                     The input file was written by a 32 bit build of
+                                  DIRSIG (version 0 or 1 bin files).
+
+External Dependancies:
+    multiprocessing
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+References:
+    [1] http://www.dirsig.org/docs/new/bin.html (Accessed 2013-02-09).
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import multiprocessing
+import os
+import struct
+import tempfile
+
+from bincodec import compression_type, decode_payload, encode_payload, \
+    _compressor
+from dirsigbin import DirsigBinIndex, pulse_header_dtype
+
+
+def pulse_data_fields(version, is32bit=False):
+    """Gets where the data compression type and pulse data bytes are.
+
+    Args:
+        version (int): The version of the bin file.
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A tuple (compression, data_bytes, data_bytes_format). compression and
+        data_bytes are the number of bytes from the field to the end of the
+        pulse header. data_bytes_format is the struct format of the pulse data
+        bytes.
+
+    """
+    # the offsets do not depend on the byte order
+    fields = pulse_header_dtype(version, '<', is32bit=is32bit)
+    data_bytes_type, data_bytes_offset = fields.fields['pulse_data_bytes'][:2]
+    return fields.itemsize - fields.fields['data_compression_type'][1], \
+        fields.itemsize - data_bytes_offset, \
+        'I' if data_bytes_type.itemsize == 4 else 'Q'
+
+
+def _transcode_payload(args):
+    """ Re-encode the pulse data of a pulse (run in a worker process) """
+    data, old_compression, new_compression, level = args
+    return encode_payload(decode_payload(data, old_compression), \
+        new_compression, level=level)
+
+
+def transcode(infile, outfile, codec='zlib', level=9, filters=(), \
+    processes=2, window=None, is32bit=False):
+    """Re-encodes the pulse data of a bin file.
+
+    Args:
+        infile (str): The bin file to read.
+        outfile (str): The bin file to write.
+        codec (str, optional): 'none', 'zlib', 'bz2' or 'lzma'. The default is
+            'zlib'.
+        level (int, optional): The compression level. The default is 9.
+        filters (iterable, optional): Any of 'shuffle' and 'delta'. The
+            default is no filters.
+        processes (int, optional): The number of worker processes. If 1, the
+            pulses are encoded in this process. The default is 2.
+        window (int, optional): The number of pulses to read before encoding
+            them. The default is None (4 per process).
+        is32bit (bool, optional): See DirsigBin.read. The default is False.
+
+    Returns:
+        A tuple (bytes in, bytes out) of the pulse data.
+
+    The output is written to a temporary file next to outfile, which is
+    renamed to outfile only once every pulse has been transcoded.
+
+    """
+    if os.path.abspath(infile) == os.path.abspath(outfile) or \
+        (os.path.exists(outfile) and os.path.samefile(infile, outfile)):
+        raise ValueError('The input and output files must be different.')
+    new_compression = compression_type(codec, filters)
+    index = DirsigBinIndex().build(infile, is32bit=is32bit)
+    # find missing codecs (e.g. lzma) here rather than in the workers
+    _compressor(new_compression)
+    for old_compression in set(index.table['data_compression_type']):
+        _compressor(int(old_compression))
+    version = index.header.file_format_version
+    endian = index.header.endian()
+    compression_field, bytes_field, bytes_format = \
+        pulse_data_fields(version, is32bit=is32bit)
+    if window is None:
+        window = 4 * max(1, processes)
+
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes=processes)
+    bytes_in = 0
+    bytes_out = 0
+    fin = open(infile, 'rb')
+    handle, tmpfile = tempfile.mkstemp(prefix='.' + \
+        os.path.basename(outfile) + '.', suffix='.tmp', \
+        dir=os.path.dirname(os.path.abspath(outfile)))
+    fout = os.fdopen(handle, 'wb')
+    finished = False
+    try:
+        position = 0
+        for first in range(0, len(index), window):
+            rows = index.table[first:first + window]
+            gaps = []
+            headers = []
+            jobs = []
+            for row in rows:
+                # everything up to the pulse header (file and task headers),
+                # then the pulse header itself; they are written with the
+                # pulse data, in file order
+                fin.seek(position)
+                gaps.append(fin.read(int(row['header_offset']) - position))
+                headers.append(bytearray(fin.read(int(row['data_offset'] - \
+                    row['header_offset']))))
+                jobs.append((fin.read(int(row['pulse_data_bytes'])), \
+                    int(row['data_compression_type']), new_compression, \
+                    level))
+                position = fin.tell()
+                bytes_in += int(row['pulse_data_bytes'])
+
+            if pool is None:
+                payloads = [_transcode_payload(job) for job in jobs]
+            else:
+                payloads = pool.map(_transcode_payload, jobs)
+
+            for gap, header, payload in zip(gaps, headers, payloads):
+                fout.write(gap)
+                header[-compression_field] = new_compression
+                header[len(header) - bytes_field:len(header) - bytes_field + \
+                    struct.calcsize(bytes_format)] = struct.pack(endian + \
+                    bytes_format, len(payload))
+                fout.write(header)
+                fout.write(payload)
+                bytes_out += len(payload)
+        # anything after the last pulse
+        fin.seek(position)
+        fout.write(fin.read())
+        fout.close()
+        # mkstemp makes the file private; give it the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmpfile, 0666 & ~umask)
+        if os.name == 'nt' and os.path.exists(outfile):
+            # rename does not replace files on Windows
+            os.remove(outfile)
+        os.rename(tmpfile, outfile)
+        finished = True
+    finally:
+        fin.close()
+        fout.close()
+        if not finished and os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return bytes_in, bytes_out
+
+
+if __name__ == '__main__':
+    import sys
+    ARGS = sys.argv[1:]
+
+    # set defaults
+    CODEC = 'zlib'
+    LEVEL = 9
+    FILTERS = []
+    PROCESSES = 2
+    IS32BIT = False
+
+    if len(ARGS) < 2:
+        sys.exit('Usage: transcode.py [options] infile outfile')
+
+    for ARG in ARGS[:-2]:
+        if ARG.lower().startswith('--codec='):
+            CODEC = ARG[8:].lower()
+        elif ARG.lower().startswith('--level='):
+            LEVEL = int(ARG[8:])
+        elif ARG.lower() == '--shuffle':
+            FILTERS.append('shuffle')
+        elif ARG.lower() == '--delta':
+            FILTERS.append('delta')
+        elif ARG.lower().startswith('--processes='):
+            PROCESSES = int(ARG[12:])
+        elif ARG.lower() == '--32bit':
+            IS32BIT = True
+        else:
+            sys.exit("'" + ARG + "' is an unexpected command line option.")
+
+    BYTES_IN, BYTES_OUT = transcode(ARGS[-2], ARGS[-1], codec=CODEC, \
+        level=LEVEL, filters=FILTERS, processes=PROCESSES, is32bit=IS32BIT)
+    print "Pulse data: {0} bytes -> {1} bytes".format(BYTES_IN, BYTES_OUT)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""This module filters the waveforms of bin file pulses.
+
+Description:
+    The returns in a waveform are blurred by the shape of the transmitted
+    pulse. The pulse shape is modeled as a Gaussian whose full width at half
+    maximum is the pulse duration of the task header, sampled at the time bin
+    width of the pulses. Every pixel waveform of a batch of pulses is filtered
+    at once, with one FFT over the time bin axis:
+        - matched_filter correlates the waveforms with the pulse shape, which
+          maximizes the signal to noise ratio of the peaks.
+        - wiener_deconvolve divides out the pulse shape, regularized by a
+          noise to signal ratio, which sharpens the returns.
+    The waveforms are zero padded so the filters do not wrap around the range
+    gate.
+
+Usage:
+    To estimate the range of every pixel of a task after a matched filter:
+        binfile = dirsig.lidarbin.DirsigBin()
+        binfile.read(filename)
+        filtered = filter_pulses(binfile[0].pulses, binfile[0].header)
+        ranges = peak_ranges(filtered, binfile[0][0])
+
+External Dependancies:
+    numpy
+
+Author(s):
+    Paul Romanczyk      par4249 at rit dot edu
+
+Copyright:
+    (c) 2015 Rochester Institute of Technology
+
+"""
+
+__author__ = "Paul Romanczyk"
+__copyright__ = "Copyright 2015, Rochester Institute of Technology"
+__credits__ = []
+__license__ = "MIT"
+#__version__ = "1.0.1"
+__maintainer__ = "Paul Romanczyk"
+__email__ = "par4249@rit.edu"
+__status__ = "Production"
+
+import numpy
+
+from noise import stack_signals
+
+# the FWHM of a Gaussian in standard deviations
+FWHM_TO_SIGMA = 1. / (2. * numpy.sqrt(2. * numpy.log(2.)))
+
+
+def pulse_shape(pulse_duration, bin_width, width=4.):
+    """Samples a Gaussian pulse shape.
+
+    Args:
+        pulse_duration (float): The full width at half maximum of the pulse in
+            seconds (the pulse duration of the task header).
+        bin_width (float): The width of a time bin in seconds.
+        width (float, optional): The number of standard deviations on each
+            side of the peak to sample. The default is 4.
+
+    Returns:
+        A numpy.array with an odd number of samples, centered on the peak,
+        that sums to 1.
+
+    """
+    sigma = pulse_duration * FWHM_TO_SIGMA / bin_width
+    half = max(int(numpy.ceil(width * sigma)), 0)
+    time = numpy.arange(-half, half + 1)
+    if sigma > 0:
+        kernel = numpy.exp(-0.5 * (time / sigma) ** 2)
+    else:
+        kernel = (time == 0).astype(float)
+    return kernel / numpy.sum(kernel)
+
+
+def _kernel_spectrum(kernel, size):
+    """ Get the rfft of a centered kernel, with its center at time 0 """
+    half = len(kernel) // 2
+    padded = numpy.zeros(size)
+    padded[:half + 1] = kernel[half:]
+    if half > 0:
+        padded[-half:] = kernel[:half]
+    return numpy.fft.rfft(padded)
+
+
+def _apply(waveforms, kernel, response):
+    """ Multiply the spectra of the waveforms by response(kernel spectrum) """
+    waveforms = numpy.asarray(waveforms, dtype=float)
+    bins = waveforms.shape[-1]
+    # zero pad so the filter does not wrap around, to a fast FFT size
+    size = 1 << int(numpy.ceil(numpy.log2(max(bins + len(kernel), 2))))
+    spectrum = numpy.fft.rfft(waveforms, n=size, axis=-1)
+    spectrum *= response(_kernel_spectrum(kernel, size))
+    return numpy.fft.irfft(spectrum, n=size, axis=-1)[..., :bins]
+
+
+def matched_filter(waveforms, kernel):
+    """Correlates waveforms with a pulse shape.
+
+    Args:
+        waveforms (numpy.array): The waveforms (..., bins).
+        kernel (numpy.array): The centered pulse shape (see pulse_shape).
+
+    Returns:
+        A numpy.array the same shape as waveforms. The peaks stay in the same
+        time bins.
+
+    """
+    return _apply(waveforms, kernel, numpy.conj)
+
+
+def wiener_deconvolve(waveforms, kernel, noise_to_signal=1e-2):
+    """Deconvolves a pulse shape from waveforms with a Wiener filter.
+
+    Args:
+        waveforms (numpy.array): The waveforms (..., bins).
+        kernel (numpy.array): The centered pulse shape (see pulse_shape).
+        noise_to_signal (float, optional): The noise to signal power ratio
+            that regularizes the division. The default is 1e-2.
+
+    Returns:
+        A numpy.array the same shape as waveforms.
+
+    """
+    return _apply(waveforms, kernel, lambda spectrum: numpy.conj(spectrum) / \
+        (numpy.abs(spectrum) ** 2 + noise_to_signal))
+
+
+def filter_pulses(pulses, task_header, mode='matched', noise_to_signal=1e-2, \
+    signal=True):
+    """Filters every pixel waveform of a batch of pulses.
+
+    Args:
+        pulses (list): DirsigBinPulses that all have the same shape and time
+            bin width.
+        task_header (DirsigBinTaskHeader): The header of the task, for the
+            pulse duration.
+        mode (str, optional): 'matched' or 'wiener'. The default is
+            'matched'.
+        noise_to_signal (float, optional): See wiener_deconvolve. The default
+            is 1e-2.
+        signal (bool, optional): Filter the signal (active + passive). If
+            False, only the active term is filtered. The default is True.
+
+    Returns:
+        A numpy.array of size pulses x X x Y x bins.
+
+    """
+    if len(pulses) == 0:
+        return numpy.empty((0, 0, 0, 0))
+    kernel = pulse_shape(task_header.pulse_duration, pulses[0].time_bin_width())
+    if signal:
+        waveforms = stack_signals(pulses)
+    else:
+        waveforms = stack_signals([pulse.active for pulse in pulses])
+    if mode == 'matched':
+        return matched_filter(waveforms, kernel)
+    elif mode == 'wiener':
+        return wiener_deconvolve(waveforms, kernel, \
+            noise_to_signal=noise_to_signal)
+    raise ValueError("Unknown filter mode '{0}'".format(mode))
+
+
+def peak_ranges(waveforms, pulse, index_of_refraction=1.0):
+    """Gets the range to the peak of every waveform.
+
+    Args:
+        waveforms (numpy.array): The (filtered) waveforms (..., bins).
+        pulse (DirsigBinPulse): A pulse with the time gate of the waveforms.
+        index_of_refraction (float, optional): The default is 1.
+
+    Returns:
+        A numpy.array of size waveforms.shape[:-1] containing the ranges in
+        meters.
+
+    """
+    time = pulse.get_time()
+    return pulse.time_to_range(time[numpy.argmax(waveforms, axis=-1)], \
+        index_of_refraction=index_of_refraction)